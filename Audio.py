@@ -0,0 +1,124 @@
+import os
+import warnings
+import numpy as np
+from scipy.io import wavfile
+
+warnings.filterwarnings("ignore", category=wavfile.WavFileWarning)  #Ignora advertencias sobre archivos WAV
+
+
+class FuenteAudio:
+    """Acceso perezoso a un canal de un archivo WAV mapeado en memoria.
+
+    Solo se leen del disco las muestras que se piden, de modo que las etapas de FFT y
+    croma pueden recorrer archivos muy largos por ventanas sin cargarlos enteros.
+    channel=None mezcla todos los canales (como librosa.load con mono=True).
+    """
+
+    def __init__(self, audio_file, channel=0, mmap=True):
+        self.audio_file = audio_file
+        self.channel = channel
+        try:
+            self.sample_rate, self.data = wavfile.read(audio_file, mmap=mmap)
+        except ValueError:
+            #Formatos que no se pueden mapear (p. ej. 24 bits): se leen de forma normal
+            self.sample_rate, self.data = wavfile.read(audio_file)
+
+        self.channels = self.data.shape[1] if self.data.ndim > 1 else 1
+        if self.data.ndim > 1 and channel is not None:
+            self.samples = self.data[:, channel]  #Vista sobre el canal, sin copiar
+        else:
+            self.samples = self.data
+
+    @property
+    def duration(self):
+        return len(self) / self.sample_rate
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, item):
+        """Devuelve las muestras de un rango como array de NumPy (solo se lee ese rango)."""
+        if self.samples.ndim > 1:
+            return self.samples[item].mean(axis=1)  #Mezcla mono de todos los canales
+        return np.asarray(self.samples[item])
+
+    def to_float(self, samples):
+        """Convierte muestras enteras al rango [-1, 1] (como librosa.load)."""
+        dtype = self.data.dtype
+        if dtype == np.uint8:
+            return (samples.astype(np.float32) - 128) / 128
+        if np.issubdtype(dtype, np.integer):
+            return samples.astype(np.float32) / -np.iinfo(dtype).min
+        return samples.astype(np.float32)
+
+    def ventanas(self, window_size, hop, frames_per_chunk=256, float_samples=False):
+        """Genera bloques de segmentos de audio que cubren frames_per_chunk ventanas solapadas.
+
+        Cada bloque empieza en el inicio de su primera ventana e incluye las muestras
+        necesarias para la última, sin relleno (como una STFT con center=False).
+        """
+        count = 1 + (len(self) - window_size) // hop if len(self) >= window_size else 0
+        for first in range(0, count, frames_per_chunk):
+            last = min(count, first + frames_per_chunk)
+            segmento = self[first * hop:(last - 1) * hop + window_size]
+            yield self.to_float(segmento) if float_samples else segmento
+
+
+class FuenteMultiple:
+    """Varias señales (canales de un archivo o tomas distintas) leídas como una matriz señales x muestras.
+
+    Las tomas más cortas se completan con ceros. mezcla='mid' añade la media de todas las
+    señales como una señal más y mezcla='sum' su suma. Las muestras se convierten a [-1, 1]
+    para que las mezclas de archivos con formatos distintos sean coherentes.
+    """
+
+    MEZCLAS = ('mid', 'sum')
+
+    def __init__(self, fuentes, nombres=None, mezcla=None):
+        if not fuentes:
+            raise ValueError("Se necesita al menos una señal.")
+        if len({fuente.sample_rate for fuente in fuentes}) != 1:
+            raise ValueError("Todas las señales deben tener la misma frecuencia de muestreo.")
+        if mezcla is not None and mezcla not in self.MEZCLAS:
+            raise ValueError(f"Mezcla no soportada: {mezcla}")
+
+        self.fuentes = fuentes
+        self.sample_rate = fuentes[0].sample_rate
+        self.mezcla = mezcla
+        self.nombres = list(nombres or [f"señal {i}" for i in range(len(fuentes))]) + ([mezcla] if mezcla else [])
+        self.signals = len(self.nombres)  #Señales, incluida la mezcla
+        self._length = max(len(fuente) for fuente in fuentes)
+
+    @classmethod
+    def canales(cls, audio_file, mezcla=None, mmap=True):
+        """Todos los canales de un archivo (cada uno es una vista del mismo mapeo en memoria)."""
+        canales = FuenteAudio(audio_file, mmap=mmap).channels
+        fuentes = [FuenteAudio(audio_file, channel=c, mmap=mmap) for c in range(canales)]
+        return cls(fuentes, [f"canal {c}" for c in range(canales)], mezcla)
+
+    @classmethod
+    def tomas(cls, audio_files, channel=0, mezcla=None, mmap=True):
+        """Un canal de cada archivo (tomas de la misma sesión)."""
+        fuentes = [FuenteAudio(audio_file, channel=channel, mmap=mmap) for audio_file in audio_files]
+        return cls(fuentes, [os.path.basename(audio_file) for audio_file in audio_files], mezcla)
+
+    @property
+    def duration(self):
+        return len(self) / self.sample_rate
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, item):
+        """Muestras de un rango de tiempo como array (señales x muestras)."""
+        start, stop, _ = item.indices(len(self))
+        bloque = np.zeros((self.signals, max(stop - start, 0)), dtype=np.float32)
+        for i, fuente in enumerate(self.fuentes):
+            muestras = fuente[start:min(stop, len(fuente))]
+            bloque[i, :len(muestras)] = fuente.to_float(muestras)
+
+        if self.mezcla == 'mid':
+            bloque[-1] = bloque[:-1].mean(axis=0)
+        elif self.mezcla == 'sum':
+            bloque[-1] = bloque[:-1].sum(axis=0)
+        return bloque
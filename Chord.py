@@ -1,13 +1,83 @@
-import librosa
+import numpy as np
+
+from Audio import FuenteAudio
+
+
+FREQ_MAX_CHROMA = 2000  #Frecuencia más alta que entra en el chromagram
+
+
+class ChromaFFT:
+    """Pliega magnitudes rfft ya calculadas (frames x bins) en 12 clases de altura.
+
+    La matriz dispersa bins -> clase se calcula una vez a partir de xf; cada bin de la banda
+    suma su potencia a la clase de la nota temperada más cercana. Cada frame se normaliza
+    por su máximo, como chroma_stft de librosa.
+    """
+
+    def __init__(self, xf, freq_min=50, freq_max=FREQ_MAX_CHROMA):
+        from scipy import sparse
+
+        self.band = np.flatnonzero((xf > 0) & (xf >= freq_min) & (xf <= freq_max))
+        clases = np.rint(69 + 12 * np.log2(xf[self.band] / 440.0)).astype(int) % 12
+        self.matriz = sparse.csr_matrix((np.ones(len(self.band)), (np.arange(len(self.band)), clases)),
+                                        shape=(len(self.band), 12))
+
+    def chroma(self, magnitudes):
+        """Chromagram (12 x frames) de una matriz de magnitudes."""
+        potencia = np.square(np.atleast_2d(magnitudes)[:, self.band])
+        chroma = np.asarray(self.matriz.T @ potencia.T)
+        maximos = chroma.max(axis=0) if chroma.size else np.zeros(chroma.shape[1])
+        return chroma / np.where(maximos > 0, maximos, 1)
+
 
 class Chord:
-    def __init__(self, audio_file_path, hop_length, n_fft):
-        self.audio_file_path = audio_file_path
-        self.y, self.sr = librosa.load(audio_file_path, sr=None)  # Carga el audio sin cambiar la frecuencia
-        self.chromagram = librosa.feature.chroma_stft(y=self.y, sr=self.sr, hop_length=hop_length, n_fft=n_fft)
+    def __init__(self, audio_file_path, hop_length, n_fft, frames_per_chunk=1024):
+        #Acepta una ruta o una FuenteAudio ya abierta (mezcla mono, como librosa.load)
+        if isinstance(audio_file_path, FuenteAudio):
+            self.fuente = audio_file_path
+        else:
+            self.fuente = FuenteAudio(audio_file_path, channel=None)
+        self.audio_file_path = self.fuente.audio_file
+        self.sr = self.fuente.sample_rate  # Frecuencia original del audio
+        self.hop_length = hop_length
+        self.frame_seconds = hop_length / self.sr  #Duración de cada frame del chromagram
+        self.chromagram = self.calcular_chromagram(hop_length, n_fft, frames_per_chunk)
+        self._plantillas()
+
+        print("Chromagram shape:", self.chromagram.shape)  # Verifica la forma del chromagram
+
+    @classmethod
+    def desde_espectro(cls, magnitudes, xf, fps, freq_min=50, freq_max=FREQ_MAX_CHROMA, block_frames=1024):
+        """Acordes a partir de las magnitudes FFT de los frames del video (sin librosa ni otra STFT).
+
+        magnitudes es una matriz (frames x bins) o un iterable de bloques de frames, como los
+        de Spectrogram.chunks(); el chromagram se calcula bloque a bloque. Los frames del
+        chromagram coinciden con los del video.
+        """
+        bloques = magnitudes
+        if isinstance(magnitudes, np.ndarray):
+            bloques = (magnitudes[i:i + block_frames] for i in range(0, len(magnitudes), block_frames))
+        croma = ChromaFFT(xf, freq_min, freq_max)
+        bloques = [croma.chroma(bloque) for bloque in bloques]
+        return cls.desde_chromagram(np.hstack(bloques) if bloques else np.zeros((12, 0)), fps)
+
+    @classmethod
+    def desde_chromagram(cls, chromagram, fps):
+        """Acordes a partir de un chromagram (12 x frames) ya calculado, con un frame por frame de video."""
+        chord = cls.__new__(cls)
+        chord.fuente = None
+        chord.audio_file_path = None
+        chord.sr = None
+        chord.hop_length = None
+        chord.frame_seconds = 1 / fps
+        chord.chromagram = chromagram
+        chord._plantillas()
+        return chord
+
+    def _plantillas(self):
         self.chroma_to_key = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
 
-        chord_list = {
+        self.chord_list = {
             # Acordes mayores
             "C": ["C", "E", "G"],
             "C#": ["C#", "F", "G#"],
@@ -37,7 +107,24 @@ class Chord:
             "Bm": ["B", "D", "F#"]
         }
 
-        print("Chromagram shape:", self.chromagram.shape)  # Verifica la forma del chromagram
+        #Matriz (acordes x 12) con un 1 en cada nota del acorde, normalizada por filas
+        self.chord_names = list(self.chord_list)
+        self.templates = np.zeros((len(self.chord_list), 12))
+        for i, notas in enumerate(self.chord_list.values()):
+            self.templates[i, [self.chroma_to_key.index(nota) for nota in notas]] = 1
+        self.templates /= np.linalg.norm(self.templates, axis=1, keepdims=True)
+
+    def calcular_chromagram(self, hop_length, n_fft, frames_per_chunk):
+        """Calcula el chromagram por bloques de ventanas para no cargar todo el audio."""
+        import librosa
+
+        bloques = []
+        for segmento in self.fuente.ventanas(n_fft, hop_length, frames_per_chunk, float_samples=True):
+            bloques.append(librosa.feature.chroma_stft(y=segmento, sr=self.sr, hop_length=hop_length,
+                                                       n_fft=n_fft, center=False))
+        if not bloques:
+            return np.zeros((12, 0))
+        return np.concatenate(bloques, axis=1)
 
     def notes_from_frame(self, frame):
         notes_detected = []
@@ -46,19 +133,103 @@ class Chord:
                 notes_detected.append((self.chroma_to_key[i], chroma_value))
         return notes_detected
 
-    def predict_chords(self):
-        chords_by_frame = []
+    def chord_scores(self, min_score=0.6):
+        """Similitud coseno de cada frame con cada plantilla (acordes + "N/A" x frames).
+
+        La última fila es el estado "sin acorde", con una puntuación constante min_score.
+        """
+        chroma = self.chromagram
+        norms = np.linalg.norm(chroma, axis=0)
+        scores = self.templates @ chroma / np.where(norms > 0, norms, 1)
+        return np.vstack([scores, np.full(chroma.shape[1], min_score)])
+
+    @staticmethod
+    def viterbi(scores, penalty, window=128):
+        """Camino de máxima puntuación acumulada con una penalización por cada cambio de acorde.
+
+        Con transiciones uniformes la recurrencia es delta(t) = max(delta(t-1), max(delta(t-1)) - penalty)
+        + obs(t): cada estado suma sus observaciones y solo depende de los demás a través del máximo
+        de cada frame. Los frames se procesan por ventanas: dada una cota inferior del máximo de cada
+        frame, toda la ventana se calcula con sumas y máximos acumulados, y la cota se recalcula desde
+        el primer frame en que cambia hasta que deja de cambiar (una pasada por cada cambio de acorde
+        que mueve el máximo).
+        """
+        states, frames = scores.shape
+        path = np.zeros(frames, dtype=int)
+        if frames == 0:
+            return path
+
+        scores = np.asarray(scores, dtype=float)
+        delta = scores[:, 0].copy()
+        best_prev = np.zeros(frames, dtype=int)
+        switched = np.zeros((states, frames), dtype=bool)
+        for first in range(1, frames, window):
+            stay = np.cumsum(scores[:, first:first + window], axis=1)  #Sin cambiar de estado
+            stay += delta[:, None]
+            n = stay.shape[1]
+            previous = np.empty_like(stay)  #delta del frame anterior
+            previous[:, 0] = delta
+            previous[:, 1:] = stay[:, :-1]
+            best = stay.max(axis=0)
+            switch = np.empty(n)  #Puntuación al cambiar de acorde en cada frame
+            switch[0] = delta.max() - penalty
+            gain = np.zeros((states, n))  #Lo que gana cada estado por haber cambiado a él
+            current = np.empty_like(stay)
+            start = 0
+            while True:
+                switch[start + 1:] = best[start:-1] - penalty
+                g = gain[:, start:]
+                np.subtract(switch[start:], previous[:, start:], out=g)
+                np.maximum.accumulate(g, axis=1, out=g)
+                np.maximum(g, gain[:, start - 1:start] if start else 0, out=g)
+                np.add(stay[:, start:], g, out=current[:, start:])
+                new_best = current.max(axis=0)
+                changed = new_best != best
+                start = int(changed.argmax())
+                if not changed[start]:
+                    break
+                best = new_best
+
+            previous[:, 1:] = current[:, :-1]
+            switched[:, first:first + n] = previous < switch
+            best_prev[first:first + n] = previous.argmax(axis=0)
+            delta = current[:, -1]
+
+        #Recorre el camino hacia atrás saltando de un cambio de acorde al anterior
+        changes = [np.flatnonzero(row) for row in switched]
+        t, state = frames - 1, int(delta.argmax())
+        while True:
+            i = np.searchsorted(changes[state], t, side='right')
+            start = int(changes[state][i - 1]) if i else 0
+            path[start:t + 1] = state
+            if not start:
+                return path
+            t, state = start - 1, int(best_prev[start])
 
-        for frame_number, frame in enumerate(self.chromagram.T):
-            notes_detected = self.notes_from_frame(frame)
+    def chords_by_frame(self, smoothing=True, penalty=1.0, min_score=0.6):
+        """Índice del acorde de cada frame (len(chord_names) significa "N/A")."""
+        scores = self.chord_scores(min_score)
+        if smoothing:
+            return self.viterbi(scores, penalty)
+        return scores.argmax(axis=0)
 
-            if notes_detected:
-                sorted_notes = sorted(notes_detected, key=lambda x: x[1], reverse=True)
-                top_notes = [note[0] for note in sorted_notes[:3]]
-                chord_prediction = "-".join(top_notes)
-            else:
-                chord_prediction = "N/A"
+    def predict_chords(self, smoothing=True, penalty=1.0, min_score=0.6, labels=None):
+        """Segmentos de acordes con su tiempo de inicio y fin en segundos (labels: acordes ya calculados)."""
+        if labels is None:
+            labels = self.chords_by_frame(smoothing, penalty, min_score)
+        names = self.chord_names + ["N/A"]
+        frame_seconds = self.frame_seconds
 
-            chords_by_frame.append((frame_number, chord_prediction))
+        #Agrupa los frames consecutivos con el mismo acorde
+        changes = np.flatnonzero(np.diff(labels)) + 1
+        starts = np.concatenate([[0], changes]) if len(labels) else np.zeros(0, dtype=int)
+        ends = np.concatenate([changes, [len(labels)]]) if len(labels) else np.zeros(0, dtype=int)
 
-        return chords_by_frame
\ No newline at end of file
+        return [
+            {
+                "chord": names[labels[start]],
+                "start": float(start * frame_seconds),
+                "end": float(end * frame_seconds),
+            }
+            for start, end in zip(starts, ends)
+        ]
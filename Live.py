@@ -0,0 +1,232 @@
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+from scipy.io import wavfile
+
+from Notes import NoteDetector, NoteStats
+from pipeline import DEFAULT_CONFIG
+
+
+class RingBuffer:
+    """Buffer circular de un productor y un consumidor sin locks.
+
+    Solo el productor modifica write_pos y solo el consumidor modifica read_pos, así que
+    basta con publicar las posiciones después de copiar los datos.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self.data = np.zeros(self.capacity, dtype=np.float32)
+        self.write_pos = 0  #Muestras escritas en total
+        self.read_pos = 0  #Muestras leídas en total
+        self.dropped = 0  #Muestras descartadas por falta de espacio
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def write(self, block):
+        """Añade un bloque; si no cabe entero, se descarta lo que sobra."""
+        free = self.capacity - self.available()
+        if len(block) > free:
+            self.dropped += len(block) - free
+            block = block[:free]
+
+        start = self.write_pos % self.capacity
+        first = min(len(block), self.capacity - start)
+        self.data[start:start + first] = block[:first]
+        self.data[:len(block) - first] = block[first:]
+        self.write_pos += len(block)
+
+    def read(self, n):
+        """Lee exactamente n muestras (o None si todavía no hay suficientes)."""
+        if self.available() < n:
+            return None
+
+        start = self.read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out = np.concatenate((self.data[start:start + first], self.data[:n - first]))
+        self.read_pos += n
+        return out
+
+
+class FuenteMicrofono:
+    """Entrada de micrófono con callback de sounddevice."""
+
+    def __init__(self, sample_rate=44100, blocksize=1024):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.bloqueante = False  #El callback de audio nunca debe esperar
+        self.terminado = threading.Event()
+        self._stream = None
+
+    def iniciar(self, callback):
+        import sounddevice as sd
+
+        def _callback(indata, frames, tiempo, status):
+            callback(indata[:, 0])
+
+        self._stream = sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='float32',
+                                      blocksize=self.blocksize, callback=_callback)
+        self._stream.start()
+
+    def detener(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+        self.terminado.set()
+
+
+class FuenteArchivo:
+    """Reproduce un archivo WAV como si fuera una entrada en vivo (sin tarjeta de sonido)."""
+
+    def __init__(self, audio_file, blocksize=1024, tiempo_real=False, channel=0):
+        self.sample_rate, data = wavfile.read(audio_file)
+        audio = data.T[channel] if data.ndim > 1 else data  #Manejo de mono y estéreo
+        self.audio = audio.astype(np.float32)
+        self.blocksize = blocksize
+        self.tiempo_real = tiempo_real  #Respeta la duración real de cada bloque
+        self.bloqueante = not tiempo_real  #Sin tiempo real, espera al consumidor en lugar de descartar
+        self.terminado = threading.Event()
+        self._detener = threading.Event()
+        self._thread = None
+
+    def iniciar(self, callback):
+        def _reproducir():
+            duracion = self.blocksize / self.sample_rate
+            for begin in range(0, len(self.audio), self.blocksize):
+                if self._detener.is_set():
+                    break
+                callback(self.audio[begin:begin + self.blocksize])
+                if self.tiempo_real:
+                    time.sleep(duracion)
+            self.terminado.set()
+
+        self._thread = threading.Thread(target=_reproducir, daemon=True)
+        self._thread.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.terminado.set()
+
+
+class AnalisisEnVivo:
+    """Analiza el audio a medida que llega: FFT por ventana, notas y estadísticas acumuladas.
+
+    El callback de la fuente solo copia muestras al buffer circular; un hilo consumidor
+    calcula cada salto de FFT. Las magnitudes se normalizan con el máximo visto hasta el
+    momento, ya que el máximo global no se conoce durante la grabación.
+    """
+
+    def __init__(self, fuente, fps=DEFAULT_CONFIG['fps'], window_seconds=DEFAULT_CONFIG['fft_window_seconds'],
+                 freq_min=DEFAULT_CONFIG['freq_min'], freq_max=DEFAULT_CONFIG['freq_max'],
+                 top_notes=DEFAULT_CONFIG['top_notes'], buffer_seconds=10, grabadora=None,
+                 pitch=DEFAULT_CONFIG['pitch'], autoguardado=None):
+        self.fuente = fuente
+        self.fs = fuente.sample_rate
+        self.top_notes = top_notes
+        self.grabadora = grabadora  #GrabarAudio opcional que guarda también el audio recibido
+        self.autoguardado = autoguardado  #Segundos entre escrituras de notes.json durante la sesión (None: solo al final)
+        self._ultimo_guardado = time.perf_counter()
+
+        self.window_size = int(self.fs * window_seconds)  #Tamaño de ventana FFT
+        self.hop = int(round(self.fs / fps))  #Muestras nuevas por frame
+        self.window = 0.5 * (1 - np.cos(np.linspace(0, 2 * np.pi, self.window_size, False)))
+        self.xf = np.fft.rfftfreq(self.window_size, 1 / self.fs)
+        self.detector = NoteDetector(self.xf, freq_min, freq_max, pitch=pitch)
+
+        self.ring = RingBuffer(self.fs * buffer_seconds)
+        self._muestras = np.zeros(self.window_size, dtype=np.float32)  #Ventana actual
+        self._datos = threading.Event()
+        self._thread = None
+
+        self.mx = 0  #Amplitud máxima vista hasta ahora
+        self.notes = NoteStats()
+        self.notas_frames = []
+
+    def _recibir(self, bloque):
+        #Callback de la fuente: solo copia las muestras
+        if self.fuente.bloqueante:
+            while self.ring.capacity - self.ring.available() < len(bloque):
+                time.sleep(0.001)
+        self.ring.write(bloque)
+        self._datos.set()
+
+    def _procesar(self, nuevas):
+        if self.grabadora is not None:
+            self.grabadora._agregar_bloque(nuevas)
+
+        #Desplaza la ventana y añade las muestras nuevas
+        self._muestras[:-self.hop] = self._muestras[self.hop:]
+        self._muestras[-self.hop:] = nuevas
+
+        fft = np.abs(np.fft.rfft(self._muestras * self.window))
+        self.mx = max(self.mx, fft.max())
+        if self.mx > 0:
+            fft /= self.mx
+
+        found = self.detector.detect(fft, self.top_notes)[0]
+        self.notes.update(found)
+        self.notas_frames.append(found)
+
+    def _consumir(self):
+        while True:
+            nuevas = self.ring.read(self.hop)
+            if nuevas is not None:
+                self._procesar(nuevas)
+                if self.autoguardado and time.perf_counter() - self._ultimo_guardado >= self.autoguardado:
+                    self.guardar()
+            elif self.fuente.terminado.is_set() and self.ring.available() < self.hop:
+                break
+            else:
+                self._datos.wait(0.05)
+                self._datos.clear()
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._consumir, daemon=True)
+        self._thread.start()
+        self.fuente.iniciar(self._recibir)
+
+    def detener(self):
+        """Detiene la fuente y espera a que se procesen las muestras pendientes."""
+        self.fuente.detener()
+        self.esperar()
+
+    def esperar(self):
+        self._thread.join()
+        return self.resultados()
+
+    def resultados(self):
+        """Estadísticas de notas ordenadas por número de veces contadas (formato de notes.json)."""
+        return self.notes.snapshot()
+
+    def guardar(self, archivo_json=os.path.join('record_data', 'notes.json')):
+        os.makedirs(os.path.dirname(archivo_json) or '.', exist_ok=True)
+        tmp = archivo_json + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.resultados(), f, indent=4)
+        os.replace(tmp, archivo_json)  #Se puede leer mientras la sesión sigue escribiendo
+        self._ultimo_guardado = time.perf_counter()
+
+
+if __name__ == '__main__':
+    #Uso: python Live.py [archivo.wav]  (sin archivo usa el micrófono)
+    if len(sys.argv) > 1:
+        analisis = AnalisisEnVivo(FuenteArchivo(sys.argv[1]))
+        analisis.iniciar()
+        analisis.esperar()
+    else:
+        analisis = AnalisisEnVivo(FuenteMicrofono())
+        analisis.iniciar()
+        input("\033[91m¡Grabando!\033[0m"
+              "\nPresiona Enter para detener la grabación...\n")
+        analisis.detener()
+
+    analisis.guardar()
+    print(json.dumps(analisis.resultados(), indent=4))
+    if analisis.ring.dropped:
+        print(f"Muestras descartadas: {analisis.ring.dropped}")
@@ -0,0 +1,290 @@
+import numpy as np
+
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]  #Notas
+
+#Convierte la frecuencia a número de nota
+def freq_to_number(f):
+    if f <= 0:
+        return float('inf')
+    return 69 + 12 * np.log2(f / 440.0)
+
+#Convierte el número de nota a frecuencia
+def number_to_freq(n): return 440 * 2.0**((n-69)/12.0)
+
+#Obtiene el nombre de la nota
+def note_name(n): return NOTE_NAMES[n % 12] + str(int(n/12 - 1))
+
+class NoteStats:
+    """Estadísticas de la nota principal de cada frame, en arrays indexados por número MIDI.
+
+    Guarda por nota el número de frames, la mayor magnitud, la última frecuencia, la suma de
+    frecuencias (para la media) y un histograma de la desviación en cents respecto a la nota
+    temperada. update es O(1) por frame, merge combina las estadísticas de bloques o procesos
+    distintos y snapshot devuelve el formato de notes.json en cualquier momento.
+    """
+
+    SIZE = 128  #Números MIDI
+
+    def __init__(self, histogram_bins=20):
+        self.histogram_bins = histogram_bins  #Bins entre -50 y +50 cents
+        self.count = np.zeros(self.SIZE, dtype=np.int64)
+        self.magnitude = np.zeros(self.SIZE)
+        self.frequency = np.zeros(self.SIZE)  #Última frecuencia
+        self.frequency_sum = np.zeros(self.SIZE)
+        self.histogram = np.zeros((self.SIZE, histogram_bins), dtype=np.int64)
+        self.first_frame = np.full(self.SIZE, -1, dtype=np.int64)  #Primer frame de cada nota (orden de empates)
+        self.frames = 0  #Frames procesados, con o sin notas
+
+    def _numbers(self, freqs):
+        #Número MIDI y bin de desviación en cents de cada frecuencia
+        exact = 69 + 12 * np.log2(np.asarray(freqs, dtype=float) / 440.0)
+        numbers = np.clip(np.rint(exact).astype(int), 0, self.SIZE - 1)
+        cents = np.clip((exact - numbers) * 100, -50, 50 - 1e-9)
+        bins = ((cents + 50) * self.histogram_bins / 100).astype(int)
+        return numbers, bins
+
+    def update(self, found):
+        """Añade la nota de mayor magnitud de un frame (las notas vienen ordenadas por magnitud)."""
+        self.frames += 1
+        if not found:
+            return
+        freq, _, mag = found[0]
+        numbers, bins = self._numbers(freq)
+        n, b = int(numbers), int(bins)
+
+        if self.first_frame[n] < 0:
+            self.first_frame[n] = self.frames - 1
+        self.count[n] += 1
+        self.magnitude[n] = max(self.magnitude[n], mag)  #Guarda la mayor magnitud
+        self.frequency[n] = freq  #Actualiza la frecuencia
+        self.frequency_sum[n] += freq
+        self.histogram[n, b] += 1
+
+    def update_many(self, found_frames):
+        """Añade un bloque de frames de una vez."""
+        rows = [i for i, found in enumerate(found_frames) if found]
+        offset = self.frames
+        self.frames += len(found_frames)
+        if not rows:
+            return
+
+        freqs = np.array([found_frames[i][0][0] for i in rows], dtype=float)
+        mags = np.array([found_frames[i][0][2] for i in rows], dtype=float)
+        numbers, bins = self._numbers(freqs)
+
+        np.add.at(self.count, numbers, 1)
+        np.maximum.at(self.magnitude, numbers, mags)
+        np.add.at(self.frequency_sum, numbers, freqs)
+        np.add.at(self.histogram, (numbers, bins), 1)
+
+        #Primera y última aparición de cada nota en el bloque
+        unique, first = np.unique(numbers, return_index=True)
+        nuevas = self.first_frame[unique] < 0
+        self.first_frame[unique[nuevas]] = offset + np.asarray(rows)[first[nuevas]]
+        unique, last = np.unique(numbers[::-1], return_index=True)
+        self.frequency[unique] = freqs[len(freqs) - 1 - last]
+
+    def merge(self, other):
+        """Combina las estadísticas de otro bloque, que se considera posterior a este."""
+        if other.histogram_bins != self.histogram_bins:
+            raise ValueError("Los histogramas deben tener el mismo número de bins")
+        vistas = other.count > 0
+        nuevas = vistas & (self.first_frame < 0)
+        self.first_frame[nuevas] = other.first_frame[nuevas] + self.frames
+        self.count += other.count
+        np.maximum(self.magnitude, other.magnitude, out=self.magnitude)
+        self.frequency[vistas] = other.frequency[vistas]
+        self.frequency_sum += other.frequency_sum
+        self.histogram += other.histogram
+        self.frames += other.frames
+        return self
+
+    def _order(self):
+        #Notas contadas, de más a menos veces; los empates por orden de aparición
+        numbers = np.flatnonzero(self.count)
+        return numbers[np.lexsort((self.first_frame[numbers], -self.count[numbers]))]
+
+    def dominant(self):
+        """Nombre de la nota contada más veces (None si no hay notas)."""
+        order = self._order()
+        return note_name(int(order[0])) if len(order) else None
+
+    def snapshot(self):
+        """Estadísticas ordenadas por número de veces contadas (formato de notes.json)."""
+        return {
+            note_name(int(n)): {
+                'count': int(self.count[n]),
+                'magnitude': float(self.magnitude[n]),
+                'frequency': float(self.frequency[n]),
+                'mean_frequency': float(self.frequency_sum[n] / self.count[n]),
+            }
+            for n in self._order()
+        }
+
+
+#Métodos de estimación de la frecuencia de cada pico
+PITCH_METHODS = ('bin', 'parabolic', 'hps')
+
+
+class NoteDetector:
+    """Notas principales de cada frame a partir de las magnitudes FFT.
+
+    pitch elige cómo se estima la frecuencia de cada pico:
+    - 'bin': frecuencia del bin (resolución de 1 / FFT_WINDOW_SECONDS Hz)
+    - 'parabolic': interpolación parabólica del logaritmo de la magnitud entre el bin y sus vecinos
+    - 'hps': espectro de producto armónico (media geométrica de los primeros armónicos) e interpolación
+      parabólica; favorece la fundamental frente a sus armónicos. El espectro armónico ordena y filtra
+      los picos, así que floor y threshold se comparan con la media geométrica de los armónicos y no con
+      la magnitud del pico; las magnitudes devueltas sí son las del espectro en el bin del pico. Los
+      frames sin ningún pico armónico sobre floor cuyo espectro armónico es casi nulo frente al
+      espectro (tonos puros, sin armónicos; menos de pure_tone veces su máximo) usan los picos del
+      espectro con interpolación parabólica.
+    """
+
+    def __init__(self, xf, freq_min=50, freq_max=1100, floor=0.05, threshold=0.6, silence=0.001,
+                 candidates=64, chunk_frames=1024, pitch='bin', harmonics=3, pure_tone=0.035):
+        if pitch not in PITCH_METHODS:
+            raise ValueError(f"Método de estimación no soportado: {pitch}")
+        self.xf = xf
+        self.pitch = pitch
+        self.harmonics = harmonics  #Armónicos del espectro de producto armónico
+        self.pure_tone = pure_tone  #Razón espectro armónico / espectro por debajo de la cual el frame es un tono puro
+        self.floor = floor  #Magnitud mínima de una nota
+        self.threshold = threshold  #Magnitud a partir de la cual la nota se añade siempre
+        self.silence = silence  #Magnitud máxima por debajo de la cual el frame es silencio
+        self.candidates = candidates  #Picos candidatos por frame antes de ordenar
+        self.chunk_frames = chunk_frames
+
+        #Bins dentro de la banda FREQ_MIN-FREQ_MAX
+        self.band = np.flatnonzero((xf > 0) & (xf >= freq_min) & (xf <= freq_max))
+
+        #Tabla bin -> número de nota y nombre
+        self.bin_numbers = np.rint(69 + 12 * np.log2(xf[self.band] / 440.0)).astype(int)
+        first = int(self.bin_numbers.min()) if len(self.band) else 0
+        last = int(self.bin_numbers.max()) if len(self.band) else 0
+        self.names = {n: note_name(n) for n in range(first - 1, last + 2)}  #±1 por la interpolación
+        self.bin_width = xf[1] - xf[0] if len(xf) > 1 else 0.0
+
+    def _spectrum(self, magnitudes):
+        """Espectro (frames x bins de la banda) sobre el que se buscan los picos."""
+        if self.pitch != 'hps':
+            return magnitudes[:, self.band]
+
+        #Media geométrica de la magnitud en f, 2f, 3f...; cada armónico toma el máximo de sus bins vecinos
+        last = magnitudes.shape[1] - 1
+        product = magnitudes[:, self.band].copy()
+        for h in range(2, self.harmonics + 1):
+            bins = self.band * h
+            harmonic = np.maximum.reduce([magnitudes[:, np.clip(bins + d, 0, last)] for d in (-1, 0, 1)])
+            product *= np.where(bins <= last, harmonic, 0)
+        return product ** (1 / self.harmonics)
+
+    def _pitch(self, band, idx):
+        """Número de nota y frecuencia de cada candidato."""
+        freqs = self.xf[self.band][idx]
+        if self.pitch == 'bin':
+            return self.bin_numbers[idx], freqs
+
+        #Interpolación parabólica sobre el logaritmo de la magnitud (solo en máximos locales)
+        edge = band.shape[1] - 1
+        left = np.take_along_axis(band, np.maximum(idx - 1, 0), axis=1)
+        center = np.take_along_axis(band, idx, axis=1)
+        right = np.take_along_axis(band, np.minimum(idx + 1, edge), axis=1)
+        with np.errstate(divide='ignore'):
+            a, b, c = (np.log(np.maximum(x, 1e-12)) for x in (left, center, right))
+        denominator = a - 2 * b + c
+        peak = (idx > 0) & (idx < edge) & (center >= left) & (center >= right) & (denominator < 0)
+        delta = np.where(peak, 0.5 * (a - c) / np.where(peak, denominator, -1), 0)
+
+        freqs = freqs + np.clip(delta, -0.5, 0.5) * self.bin_width
+        numbers = np.rint(69 + 12 * np.log2(freqs / 440.0)).astype(int)
+        return numbers, freqs
+
+    def _select(self, band, real, num, k):
+        """Notas aceptadas (números, frecuencias y magnitudes ordenados) para un bloque de frames.
+
+        Los picos se ordenan y filtran en band; las magnitudes devueltas son las de real en el bin
+        de cada pico (la misma matriz salvo con 'hps').
+        """
+        if k < band.shape[1]:
+            idx = np.argpartition(-band, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(band.shape[1]), band.shape)
+        vals = np.take_along_axis(band, idx, axis=1)
+
+        #Ordena los candidatos por magnitud (y por bin en caso de empate)
+        order = np.lexsort((idx, -vals), axis=1)
+        idx = np.take_along_axis(idx, order, axis=1)
+        vals = np.take_along_axis(vals, order, axis=1)
+        numbers, freqs = self._pitch(band, idx)
+
+        #Una nota por nombre salvo que supere el umbral de inclusión
+        valid = vals >= self.floor
+        earlier = np.tril(np.ones((k, k), dtype=bool), -1)
+        repeated = ((numbers[:, :, None] == numbers[:, None, :]) & earlier & valid[:, None, :]).any(axis=2)
+        accepted = valid & ((vals > self.threshold) | ~repeated)
+
+        #Si faltan notas y quedan candidatos válidos fuera de la selección, el resultado no es exacto
+        incomplete = (accepted.sum(axis=1) < num) & valid[:, -1] & (k < band.shape[1])
+        if real is not band:
+            vals = np.take_along_axis(real, idx, axis=1)
+        return (numbers, freqs, vals, accepted), incomplete
+
+    def _found(self, numbers, freqs, vals, accepted, num):
+        found = []
+        for i in np.flatnonzero(accepted)[:num]:
+            found.append([float(freqs[i]), self.names[int(numbers[i])], float(vals[i])])
+        return found
+
+    def _block(self, band, real, num, k):
+        """Notas de cada frame de un bloque; los frames inexactos se repiten con todos los bins."""
+        selected, incomplete = self._select(band, real, num, k)
+        found = []
+        for j in range(len(band)):
+            if incomplete[j]:
+                full, _ = self._select(band[j:j + 1], real[j:j + 1], num, band.shape[1])
+                found.append(self._found(*(x[0] for x in full), num))
+            else:
+                found.append(self._found(*(x[j] for x in selected), num))
+        return found
+
+    def detect(self, magnitudes, num):
+        """Notas principales de cada frame de una matriz (frames x bins) de magnitudes normalizadas.
+
+        Con un lote (señales x frames x bins) todas las señales se procesan en la misma pasada
+        y se devuelve una lista de frames por señal.
+        """
+        if np.ndim(magnitudes) == 3:
+            signals, frames, bins = magnitudes.shape
+            found = self.detect(magnitudes.reshape(signals * frames, bins), num)
+            return [found[i * frames:(i + 1) * frames] for i in range(signals)]
+
+        magnitudes = np.atleast_2d(magnitudes)
+        results = [[] for _ in range(len(magnitudes))]
+        if not len(self.band) or num <= 0:
+            return results
+
+        #Los frames en silencio no tienen notas
+        active = np.flatnonzero(magnitudes.max(axis=1) >= self.silence)
+        k = min(self.candidates, len(self.band))
+
+        for begin in range(0, len(active), self.chunk_frames):
+            rows = active[begin:begin + self.chunk_frames]
+            block = magnitudes[rows]
+            band = self._spectrum(block)
+            real = block[:, self.band] if self.pitch == 'hps' else band
+            found = self._block(band, real, num, k)
+
+            if self.pitch == 'hps':
+                #Sin armónicos el espectro armónico queda bajo floor: se usan los picos del espectro
+                peak = real.max(axis=1)
+                empty = np.array([not notes for notes in found]) & (peak >= self.floor)
+                empty &= band.max(axis=1) < self.pure_tone * peak
+                peaks = real[empty]
+                for j, notes in zip(np.flatnonzero(empty), self._block(peaks, peaks, num, k)):
+                    found[j] = notes
+
+            for j, row in enumerate(rows):
+                results[row] = found[j]
+
+        return results
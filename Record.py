@@ -1,42 +1,149 @@
 import os
+import struct
 import sys
-import sounddevice as sd
+import threading
 import numpy as np
 from scipy.io.wavfile import write
 
+
+class BufferAudio:
+    """Buffer float32 que duplica su capacidad al llenarse (coste total O(n))."""
+
+    def __init__(self, capacidad=44100 * 60):
+        self.datos = np.empty(capacidad, dtype=np.float32)
+        self.size = 0
+
+    def agregar(self, bloque):
+        fin = self.size + len(bloque)
+        if fin > len(self.datos):
+            nuevos = np.empty(max(fin, 2 * len(self.datos)), dtype=np.float32)
+            nuevos[:self.size] = self.datos[:self.size]
+            self.datos = nuevos
+        self.datos[self.size:fin] = bloque
+        self.size = fin
+
+    def array(self):
+        return self.datos[:self.size]
+
+
+class EscritorWav:
+    """Escribe un WAV float32 mono por bloques y completa la cabecera al cerrarlo.
+
+    Usa el mismo formato que scipy.io.wavfile.write para float32 (fmt IEEE float + fact).
+    """
+
+    def __init__(self, ruta, sample_rate):
+        self.ruta = ruta
+        self.muestras = 0
+        self.file = open(ruta, 'wb')
+
+        fmt_chunk = struct.pack('<HHIIHH', 3, 1, sample_rate, sample_rate * 4, 4, 32) + b'\x00\x00'
+        cabecera = b'RIFF' + b'\x00\x00\x00\x00' + b'WAVE'
+        cabecera += b'fmt ' + struct.pack('<I', len(fmt_chunk)) + fmt_chunk
+        self._fact = len(cabecera) + 8  #Posición del número de muestras
+        cabecera += b'fact' + struct.pack('<II', 4, 0)
+        self._data = len(cabecera) + 4  #Posición del tamaño de los datos
+        cabecera += b'data' + b'\x00\x00\x00\x00'
+        self.file.write(cabecera)
+
+    def escribir(self, bloque):
+        bloque = np.asarray(bloque, dtype='<f4')
+        self.file.write(bloque.tobytes())
+        self.muestras += len(bloque)
+
+    def cerrar(self):
+        tamano_datos = self.muestras * 4
+        tamano_total = self.file.tell()
+        self.file.seek(4)
+        self.file.write(struct.pack('<I', tamano_total - 8))
+        self.file.seek(self._fact)
+        self.file.write(struct.pack('<I', self.muestras))
+        self.file.seek(self._data)
+        self.file.write(struct.pack('<I', tamano_datos))
+        self.file.close()
+
+
 class GrabarAudio:
-    def __init__(self, output_folder='records', sample_rate=44100):
+    def __init__(self, output_folder='records', sample_rate=44100, modo='memoria', nombre_archivo="record"):
         self.output_folder = output_folder
         self.sample_rate = sample_rate
         self.grabando = False
-        self.grabacion = np.array([])  # Usamos un array para almacenar el audio
+        self.modo = modo  #'memoria' (buffer en RAM) o 'disco' (escribe el WAV mientras graba)
+        self.nombre_archivo = nombre_archivo
+        self.muestras = 0
+        self._terminado = threading.Event()
+        self._terminado.set()
 
         # Crea la carpeta si no existe
         if not os.path.exists(self.output_folder):
             os.makedirs(self.output_folder)
 
+        if modo == 'memoria':
+            self.buffer = BufferAudio(sample_rate * 60)  # Buffer float32 para almacenar el audio
+            self.escritor = None
+        elif modo == 'disco':
+            self.buffer = None
+            self.escritor = EscritorWav(self._ruta(nombre_archivo + ".part"), sample_rate)
+        else:
+            raise ValueError(f"Modo de grabación no soportado: {modo}")
+
+    def _ruta(self, nombre_archivo):
+        return os.path.join(self.output_folder, nombre_archivo + ".wav")
+
+    @property
+    def grabacion(self):
+        return self.buffer.array() if self.buffer is not None else np.zeros(0, dtype=np.float32)
+
     def grabar_voz(self):
+        import sounddevice as sd
+
         self.grabando = True
+        self._terminado.clear()
+
+        try:
+            with sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='float32') as stream:
+                while self.grabando:
+                    #Graba en bloques de 1 segundo
+                    audio_bloque = stream.read(self.sample_rate)[0]  # Esto devuelve un array 2D
+                    self._agregar_bloque(audio_bloque[:, 0])
+        finally:
+            self._terminado.set()
 
-        with sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='float32') as stream:
-            while self.grabando:
-                #Graba en bloques de 1 segundo
-                audio_bloque = stream.read(self.sample_rate)[0]  # Esto devuelve un array 2D
-                self.grabacion = np.concatenate((self.grabacion, audio_bloque.flatten()))  # Aplanamos el bloque
+    def _agregar_bloque(self, bloque):
+        if self.escritor is not None:
+            self.escritor.escribir(bloque)
+        else:
+            self.buffer.agregar(bloque)
+        self.muestras += len(bloque)
 
-    def detener_grabacion(self, nombre_archivo="record"):
+    def detener_grabacion(self, nombre_archivo=None):
         input("\033[91m¡Grabando!\033[0m"
               "\nPresiona Enter para detener la grabación...\n")
         self.grabando = False
 
+        #Espera a que termine el último bloque antes de cerrar el archivo
+        self._terminado.wait()
+
+        return self.finalizar(nombre_archivo)
+
+    def finalizar(self, nombre_archivo=None):
+        """Cierra la grabación y devuelve la ruta del WAV."""
+        wav_path = self._ruta(nombre_archivo or self.nombre_archivo)
+
+        if self.escritor is not None:
+            self.escritor.cerrar()
+            if self.muestras == 0:
+                os.remove(self.escritor.ruta)
+            else:
+                os.replace(self.escritor.ruta, wav_path)
+
         #Verifica si hay grabaciones antes de intentar guardar
-        if self.grabacion.size == 0:
+        if self.muestras == 0:
             print("\033[91mError: Grabación demasiado corta.\033[0m")
             sys.exit()
 
         #Guarda el archivo WAV
-        wav_path = os.path.join(self.output_folder, nombre_archivo + ".wav")
-        write(wav_path, self.sample_rate, self.grabacion)
+        if self.buffer is not None:
+            write(wav_path, self.sample_rate, self.buffer.array())
         print(f"Grabación guardada en: {wav_path}")
         return wav_path
-
@@ -0,0 +1,298 @@
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import tqdm
+
+#Graficar espectro de frecuencias
+def plot_fft(p, xf, fs, notes, dimensions=(960, 540), freq_range=(50, 1100)):
+    import plotly.graph_objects as go
+
+    layout = go.Layout(
+        title="Espectro de Frecuencias",
+        autosize=False,
+        width=dimensions[0],  #Ancho de gráfico
+        height=dimensions[1],  #Altura de gráfico
+        xaxis_title="Frecuencia (nota)",  #Eje X
+        yaxis_title="Magnitud",  #Eje Y
+        font={'size': 24}  #Tamaño de fuente
+    )
+
+    #Crea figura de Plotly
+    fig = go.Figure(layout=layout,
+                    layout_xaxis_range=list(freq_range),
+                    layout_yaxis_range=[0, 1]
+                    )
+
+    #Datos de frecuencia
+    fig.add_trace(go.Scatter(
+        x=xf,
+        y=p))
+
+    #Anotaciones para notas detectadas
+    for note in notes:
+        fig.add_annotation(x=note[0] + 10, y=note[2],
+                           text=note[1],
+                           font={'size': 48},
+                           showarrow=False)
+    return fig
+
+#Título de un frame, con el acorde si se conoce (sin número de frame si frame_number es None)
+def frame_title(frame_number, chord=None):
+    title = "Espectro de Frecuencias" if frame_number is None else f"Espectro de Frecuencia / Frame {frame_number}"
+    return f"{title} / Acorde {chord}" if chord else title
+
+
+def frames_con_cambios(xf, magnitudes, notas_frames, tolerance, freq_range=(50, 1100), acordes=None):
+    """Índices de los frames que cambian visiblemente respecto al último frame que se renderiza.
+
+    Un frame se renderiza si alguna magnitud visible (entre freq_range) se aleja más de
+    tolerance (fracción de la altura del eje) de la del último frame renderizado, si cambian
+    las notas detectadas, si alguna etiqueta se mueve más de tolerance (fracción del ancho o
+    de la altura del eje), o si cambia el acorde. El resto repite la imagen anterior.
+    """
+    if not len(magnitudes):
+        return np.zeros(0, dtype=int)
+    visible = (xf >= freq_range[0]) & (xf <= freq_range[1])
+    ejes = np.array([freq_range[1] - freq_range[0], 1.0])  #Tamaño de los ejes x (Hz) e y
+
+    def etiquetas(i):
+        #Posición de cada etiqueta en unidades de los ejes
+        posiciones = np.array([[note[0], note[2]] for note in notas_frames[i]], dtype=float).reshape(-1, 2)
+        return [note[1] for note in notas_frames[i]], posiciones / ejes
+
+    indices = [0]
+    referencia = magnitudes[0][visible]
+    nombres, posiciones = etiquetas(0)
+    for i in range(1, len(magnitudes)):
+        actual = magnitudes[i][visible]
+        nombres_i, posiciones_i = etiquetas(i)
+        cambia = (
+            nombres_i != nombres
+            or (acordes is not None and acordes[i] != acordes[indices[-1]])
+            or (len(posiciones_i) and np.abs(posiciones_i - posiciones).max() > tolerance)
+            or np.abs(actual - referencia).max() > tolerance
+        )
+        if cambia:
+            indices.append(i)
+            referencia, nombres, posiciones = actual, nombres_i, posiciones_i
+    return np.array(indices)
+
+#Actualiza una figura existente con los datos de un frame
+def update_fft(fig, frame_number, p, notes, chord=None):
+    import plotly.graph_objects as go
+
+    with fig.batch_update():
+        fig.data[0].y = p
+        fig.layout.annotations = [
+            go.layout.Annotation(x=note[0] + 10, y=note[2],
+                                 text=note[1],
+                                 font={'size': 48},
+                                 showarrow=False)
+            for note in notes
+        ]
+        fig.layout.title.text = frame_title(frame_number, chord)
+    return fig
+
+
+class PlotlyRenderer:
+    """Renderizador "bonito": figura de Plotly exportada con Kaleido."""
+    frame_format = 'png'
+
+    def __init__(self, xf, dimensions=(1280, 720), freq_range=(50, 1100), scale=2):
+        self.scale = scale
+        self.fig = plot_fft(np.zeros(len(xf)), xf, None, [], dimensions, freq_range)
+
+    def render(self, frame_number, p, notes, chord=None):
+        """Devuelve el frame como bytes PNG."""
+        return update_fft(self.fig, frame_number, p, notes, chord).to_image(format='png', scale=self.scale)
+
+    def save(self, path, frame_number, p, notes, chord=None):
+        update_fft(self.fig, frame_number, p, notes, chord).write_image(path, scale=self.scale)
+
+
+class AggRenderer:
+    """Renderizador rápido con Matplotlib/Agg.
+
+    Los ejes, la rejilla y las etiquetas se dibujan una sola vez en un fondo en caché;
+    en cada frame solo se dibujan la línea de magnitudes, el título y las notas.
+    """
+    frame_format = 'rgb'
+
+    def __init__(self, xf, dimensions=(1280, 720), freq_range=(50, 1100), scale=1, dpi=100):
+        #scale no se usa: el frame sale siempre a la resolución pedida para el video
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        #Solo se dibujan los bins visibles (más uno a cada lado)
+        visible = np.flatnonzero((xf >= freq_range[0]) & (xf <= freq_range[1]))
+        first = max(visible[0] - 1, 0) if len(visible) else 0
+        last = min(visible[-1] + 2, len(xf)) if len(visible) else 0
+        self.visible = slice(first, last)
+
+        self.fig = Figure(figsize=(dimensions[0] / dpi, dimensions[1] / dpi), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_xlim(*freq_range)
+        self.ax.set_ylim(0, 1)
+        self.ax.set_xlabel("Frecuencia (nota)", fontsize=16)  #Eje X
+        self.ax.set_ylabel("Magnitud", fontsize=16)  #Eje Y
+        self.ax.grid(True)
+
+        #Elementos que cambian en cada frame
+        self.line, = self.ax.plot(xf[self.visible], np.zeros(last - first), animated=True)
+        self.title = self.ax.set_title("Espectro de Frecuencias", fontsize=18, animated=True)
+        self.labels = []
+
+        #Fondo estático en caché
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.buffer = np.asarray(self.canvas.buffer_rgba())
+
+    def _label(self, i):
+        while len(self.labels) <= i:
+            self.labels.append(self.ax.text(0, 0, "", fontsize=32, ha='center', va='center',
+                                            animated=True, clip_on=True))
+        return self.labels[i]
+
+    def render(self, frame_number, p, notes, chord=None):
+        """Devuelve el frame como array RGB (alto x ancho x 3) sobre el buffer de Agg."""
+        self.canvas.restore_region(self.background)
+
+        self.line.set_ydata(p[self.visible])
+        self.ax.draw_artist(self.line)
+
+        self.title.set_text(frame_title(frame_number, chord))
+        self.ax.draw_artist(self.title)
+
+        #Anotaciones para notas detectadas
+        for i, note in enumerate(notes):
+            label = self._label(i)
+            label.set_position((note[0] + 10, note[2]))
+            label.set_text(note[1])
+            self.ax.draw_artist(label)
+
+        return self.buffer[:, :, :3]
+
+    def save(self, path, frame_number, p, notes, chord=None):
+        import matplotlib.image
+        matplotlib.image.imsave(path, self.render(frame_number, p, notes, chord))
+
+
+RENDERERS = {
+    'plotly': PlotlyRenderer,
+    'agg': AggRenderer,
+}
+
+
+#Estado de cada proceso del pool: un renderizador (y su proceso de Kaleido) que se reutiliza
+_worker = {}
+
+def _init_worker(backend, xf, folder, dimensions, freq_range, scale, numbered=True):
+    _worker['renderer'] = RENDERERS[backend](xf, dimensions, freq_range, scale)
+    _worker['folder'] = folder
+    _worker['numbered'] = numbered  #Número de frame en el título
+
+def _render_frame(args):
+    frame_number, p, notes, chord = args
+    start = time.perf_counter()
+    renderer = _worker['renderer']
+    title_number = frame_number if _worker['numbered'] else None
+
+    if _worker['folder'] is None:
+        #Devuelve la imagen para enviarla directamente a ffmpeg
+        data = renderer.render(title_number, p, notes, chord)
+        if isinstance(data, np.ndarray):
+            data = data.copy()  #El buffer se reutiliza en el siguiente frame
+    else:
+        #Guardar el gráfico en la carpeta de frames
+        renderer.save(os.path.join(_worker['folder'], f"frame{frame_number}.png"), title_number, p, notes, chord)
+        data = None
+    return os.getpid(), frame_number, time.perf_counter() - start, data
+
+#Como pool.map, pero con un número acotado de frames en curso
+def _imap(pool, fn, tasks, max_pending):
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(fn, task))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class RenderPool:
+    def __init__(self, xf, folder='frames', workers=None, dimensions=(1280, 720), freq_range=(50, 1100),
+                 scale=2, max_pending=None, backend='plotly'):
+        if backend not in RENDERERS:
+            raise ValueError(f"Renderizador no soportado: {backend}")
+        self.backend = backend
+        self.frame_format = RENDERERS[backend].frame_format  #'png' o 'rgb'
+        self.xf = xf
+        self.folder = folder  #None para devolver los PNG en memoria en lugar de escribirlos
+        self.workers = workers or os.cpu_count() or 1  #Procesos de renderizado
+        self.dimensions = dimensions
+        self.freq_range = freq_range
+        self.scale = scale
+        self.max_pending = max_pending or 4 * self.workers  #Frames en curso como máximo
+
+        #Frames y segundos de trabajo por proceso
+        self.stats = defaultdict(lambda: {'frames': 0, 'seconds': 0.0})
+
+    def _tasks(self, magnitudes, notas_frames, acordes=None):
+        for frame_number, (p, notes) in enumerate(zip(magnitudes, notas_frames)):
+            yield frame_number, p, notes, acordes[frame_number] if acordes is not None else None
+
+    def _run(self, tasks, total, numbered=True):
+        initargs = (self.backend, self.xf, self.folder, self.dimensions, self.freq_range, self.scale, numbered)
+        start = time.perf_counter()
+
+        if self.workers == 1:
+            #Sin pool: renderiza en el proceso actual
+            _init_worker(*initargs)
+            yield from self._collect(map(_render_frame, tasks), total)
+        else:
+            with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=initargs) as pool:
+                results = _imap(pool, _render_frame, tasks, self.max_pending)
+                yield from self._collect(results, total)
+
+        self.report(time.perf_counter() - start)
+
+    def frames(self, magnitudes, notas_frames, acordes=None):
+        """Renderiza los frames en paralelo y los devuelve en orden (acordes: nombre por frame, opcional)."""
+        yield from self._run(self._tasks(magnitudes, notas_frames, acordes), len(magnitudes))
+
+    def frames_unicos(self, magnitudes, notas_frames, indices, acordes=None):
+        """Renderiza solo los frames de indices y devuelve (imagen, repeticiones) en orden.
+
+        Cada imagen se repite hasta el siguiente frame renderizado. El título no lleva el
+        número de frame, que dejaría de ser correcto en los frames repetidos.
+        """
+        tasks = ((int(i), magnitudes[i], notas_frames[i], acordes[i] if acordes is not None else None)
+                 for i in indices)
+        repeticiones = np.diff(np.append(indices, len(magnitudes)))
+        for data, n in zip(self._run(tasks, len(indices), numbered=False), repeticiones):
+            yield data, int(n)
+
+    def render(self, magnitudes, notas_frames, acordes=None, indices=None):
+        """Genera un PNG por frame (o solo por los frames de indices) repartiendo la exportación entre los procesos."""
+        frames = (self.frames(magnitudes, notas_frames, acordes) if indices is None
+                  else self.frames_unicos(magnitudes, notas_frames, indices, acordes))
+        for _ in frames:
+            pass
+
+    def _collect(self, results, total):
+        for pid, frame_number, seconds, data in tqdm.tqdm(results, total=total):
+            self.stats[pid]['frames'] += 1
+            self.stats[pid]['seconds'] += seconds
+            yield data
+
+    def report(self, elapsed):
+        """Muestra el rendimiento total y por proceso."""
+        total = sum(s['frames'] for s in self.stats.values())
+        if elapsed > 0:
+            print(f"Frames renderizados: {total} en {elapsed:.2f} s ({total / elapsed:.2f} frames/s)")
+        for pid, s in sorted(self.stats.items()):
+            rate = s['frames'] / s['seconds'] if s['seconds'] else 0
+            print(f"  Proceso {pid}: {s['frames']} frames, {rate:.2f} frames/s")
@@ -0,0 +1,149 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class Spectrogram:
+    """Magnitudes FFT por frame de video de una señal o de un lote de señales.
+
+    audio puede ser un array de NumPy (1-D, o señales x muestras), una FuenteAudio o una
+    FuenteMultiple (varios canales o tomas). Con varias señales todas se transforman en la
+    misma pasada: las magnitudes tienen forma (señales x frames x bins) y cada señal se
+    normaliza por su propio máximo, de modo que el resultado de cada una es el mismo que
+    si se analizara por separado.
+    """
+
+    def __init__(self, audio, fs, fps=30, window_seconds=0.25, chunk_frames=256, cache=True):
+        self.audio = audio  #Array de NumPy o FuenteAudio (cualquier objeto con len() y cortes)
+        if isinstance(audio, np.ndarray):
+            self.signals = audio.shape[:-1]  #() para una sola señal
+            length = audio.shape[-1]
+        else:
+            self.signals = (audio.signals,) if hasattr(audio, 'signals') else ()
+            length = len(audio)
+        self.fs = fs
+        self.fps = fps
+        self.chunk_frames = chunk_frames  #Frames por bloque de rfft (limita la memoria temporal)
+        self.cache = cache  #Guarda la matriz completa de magnitudes
+
+        self.window_size = int(fs * window_seconds)  #Tamaño de ventana FFT
+        self.audio_length = length / fs  #Duración de audio en segundos
+        self.frame_count = int(self.audio_length * fps)  #Cuenta frames totales
+        self.frame_offset = int(length / self.frame_count) if self.frame_count else 0  #Offset frame
+
+        #Crea ventana de Hann para FFT
+        self.window = 0.5 * (1 - np.cos(np.linspace(0, 2 * np.pi, self.window_size, False)))
+        self.xf = np.fft.rfftfreq(self.window_size, 1 / fs)  #Calcula frecuencias FFT
+
+        self._magnitudes = None
+        self._max = None
+
+    def _slice(self, begin, end):
+        #Las muestras están en el último eje de los arrays y en el primero de las fuentes
+        if isinstance(self.audio, np.ndarray):
+            return self.audio[..., begin:end]
+        return self.audio[begin:end]
+
+    def _segment(self, begin, end):
+        #Audio entre begin y end, con ceros antes del inicio
+        if begin >= 0:
+            return self._slice(begin, end)
+        segment = np.zeros(self.signals + (end - begin,), dtype=float)
+        if end > 0:
+            segment[..., -begin:] = self._slice(0, end)
+        return segment
+
+    def frame(self, frame_number):
+        """Muestras de un frame concreto (equivalente a extract_sample)."""
+        end = frame_number * self.frame_offset
+        return self._segment(end - self.window_size, end)
+
+    def _chunks(self):
+        """Bloques ([señales x] frames x muestras) de ventanas solapadas.
+
+        Cada bloque es una vista con saltos de FRAME_OFFSET sobre un único segmento de
+        audio; solo los primeros frames, que empiezan antes del audio, llevan relleno.
+        """
+        size = self.window_size
+        offset = self.frame_offset
+        for first in range(0, self.frame_count, self.chunk_frames):
+            last = min(self.frame_count, first + self.chunk_frames)
+            segment = self._segment(first * offset - size, (last - 1) * offset)
+            yield first, sliding_window_view(segment, size, axis=-1)[..., ::offset, :]
+
+    def _fft_chunks(self):
+        #Magnitudes sin normalizar de cada bloque
+        for first, chunk in self._chunks():
+            yield first, np.abs(np.fft.rfft(chunk * self.window, axis=-1))
+
+    def _update_max(self, mx, block):
+        #Máximo acumulado (uno por señal si hay varias)
+        if not self.signals:
+            return max(mx, block.max())
+        return np.maximum(mx, block.reshape(self.signals + (-1,)).max(axis=-1))
+
+    def _normalize(self, block, mx):
+        #Divide cada señal por su máximo (las señales en silencio se dejan igual)
+        if not self.signals:
+            if mx > 0:
+                block /= mx
+            return
+        block /= np.where(mx > 0, mx, 1)[..., None, None]
+
+    def compute(self):
+        """Calcula todas las magnitudes FFT normalizadas y la amplitud máxima global.
+
+        El resultado se guarda en caché para las etapas posteriores.
+        """
+        if self._magnitudes is not None:
+            return self._magnitudes, self._max
+
+        magnitudes = np.empty(self.signals + (self.frame_count, len(self.xf)), dtype=float)
+        mx = np.zeros(self.signals) if self.signals else 0
+        for first, block in self._fft_chunks():
+            magnitudes[..., first:first + block.shape[-2], :] = block
+            if block.shape[-2]:
+                mx = self._update_max(mx, block)
+
+        #Normaliza en el mismo buffer
+        self._normalize(magnitudes, mx)
+
+        self._magnitudes = magnitudes
+        self._max = mx
+        return self._magnitudes, self._max
+
+    def compute_max(self):
+        """Amplitud máxima global sin guardar las magnitudes."""
+        if self._max is None:
+            mx = np.zeros(self.signals) if self.signals else 0
+            for first, block in self._fft_chunks():
+                if block.shape[-2]:
+                    mx = self._update_max(mx, block)
+            self._max = mx
+        return self._max
+
+    def chunks(self, mx=None):
+        """Genera (primer frame, magnitudes normalizadas) por bloques.
+
+        Con cache=False la memoria queda acotada a un bloque: se hace una primera pasada
+        para la amplitud máxima y una segunda para las magnitudes normalizadas. Si ya se
+        conoce la amplitud máxima (mx), se omite la primera pasada.
+        """
+        if self.cache or self._magnitudes is not None:
+            magnitudes, mx = self.compute()
+            for first in range(0, self.frame_count, self.chunk_frames):
+                yield first, magnitudes[..., first:first + self.chunk_frames, :]
+            return
+
+        if mx is None:
+            mx = self.compute_max()
+        for first, block in self._fft_chunks():
+            self._normalize(block, mx)
+            yield first, block
+
+    @property
+    def magnitudes(self):
+        return self.compute()[0]
+
+    @property
+    def max(self):
+        return self.compute()[1]
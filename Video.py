@@ -0,0 +1,182 @@
+import os
+import queue
+import subprocess
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+VideoResult = namedtuple('VideoResult', ['returncode', 'stdout', 'stderr'])
+
+#Opciones de codificación comunes a todos los modos
+def _opciones_salida(audio_file, ruta_salida, fps=None):
+    return [
+        "-i", audio_file,  #Archivo de audio
+    ] + (["-r", str(fps), "-vsync", "cfr"] if fps else []) + [  #Frames por segundo constantes en la salida
+        "-c:v", "libx264",  #Códec de video
+        "-pix_fmt", "yuv420p",  #Formato de píxel
+        ruta_salida
+    ]
+
+#Generar el video a partir de los PNG de la carpeta de frames
+def generar_video(frame_folder, audio_file, ruta_salida, fps=30, resolution=(1280, 720), duraciones=None):
+    """duraciones ({frame: repeticiones}) usa solo esos PNG, cada uno durante sus repeticiones."""
+    if duraciones is not None:
+        return _generar_video_concat(frame_folder, audio_file, ruta_salida, fps, duraciones)
+
+    generarVideo = [
+        "ffmpeg",
+        "-y",  #Sobrescribe archivos existentes
+        "-r", str(fps),  #Frames por segundo
+        "-f", "image2",  #Indica que las entradas son imágenes
+        "-s", f"{resolution[0]}x{resolution[1]}",  #Resolución del video
+        "-i", os.path.join(frame_folder, "frame%d.png"),  #Imágenes de entrada
+    ] + _opciones_salida(audio_file, ruta_salida)
+
+    #Ejecuta ffmpeg
+    return subprocess.run(generarVideo, cwd=os.getcwd(), capture_output=True)
+
+#Video a partir de los PNG distintos con la duración de cada uno (demuxer concat de ffmpeg)
+def _generar_video_concat(frame_folder, audio_file, ruta_salida, fps, duraciones):
+    lista = os.path.join(frame_folder, "frames.txt")
+    with open(lista, 'w') as f:
+        for frame_number, repeticiones in sorted(duraciones.items()):
+            f.write(f"file 'frame{frame_number}.png'\n")
+            f.write(f"duration {repeticiones / fps:.6f}\n")
+        if duraciones:
+            #concat ignora la duración de la última entrada si no se repite el archivo
+            f.write(f"file 'frame{max(duraciones)}.png'\n")
+
+    generarVideo = [
+        "ffmpeg",
+        "-y",  #Sobrescribe archivos existentes
+        "-f", "concat",  #Lista de imágenes con su duración
+        "-safe", "0",
+        "-i", lista,
+    ] + _opciones_salida(audio_file, ruta_salida, fps)
+
+    #Ejecuta ffmpeg
+    return subprocess.run(generarVideo, cwd=os.getcwd(), capture_output=True)
+
+
+class VideoStream:
+    """Proceso de ffmpeg abierto al que se envían los frames por stdin.
+
+    input_format='rgb' espera arrays (alto x ancho x 3) de uint8; input_format='png'
+    espera los bytes de cada imagen PNG. La cola limita los frames pendientes, de modo
+    que write() se bloquea si ffmpeg va más lento que el renderizado.
+    """
+
+    def __init__(self, ruta_salida, audio_file, fps=30, resolution=(1280, 720), input_format='rgb',
+                 queue_size=32):
+        self.resolution = resolution
+        self.input_format = input_format
+        self.frames = 0
+        self.bytes_written = 0
+
+        if input_format == 'rgb':
+            entrada = [
+                "-f", "rawvideo",  #Frames RGB sin comprimir
+                "-pix_fmt", "rgb24",
+                "-s", f"{resolution[0]}x{resolution[1]}",  #Resolución del video
+            ]
+        elif input_format == 'png':
+            entrada = [
+                "-f", "image2pipe",  #Imágenes PNG concatenadas
+                "-c:v", "png",
+                "-s", f"{resolution[0]}x{resolution[1]}",  #Resolución del video
+            ]
+        else:
+            raise ValueError(f"Formato de entrada no soportado: {input_format}")
+
+        generarVideo = [
+            "ffmpeg",
+            "-y",  #Sobrescribe archivos existentes
+            "-r", str(fps),  #Frames por segundo
+        ] + entrada + ["-i", "-"] + _opciones_salida(audio_file, ruta_salida)
+
+        self.process = subprocess.Popen(generarVideo, cwd=os.getcwd(), stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        #Lee la salida de ffmpeg en segundo plano para que no se llene el pipe
+        self._stdout = []
+        self._stderr = []
+        self._readers = [
+            threading.Thread(target=self._drain, args=(self.process.stdout, self._stdout), daemon=True),
+            threading.Thread(target=self._drain, args=(self.process.stderr, self._stderr), daemon=True),
+        ]
+        for reader in self._readers:
+            reader.start()
+
+        #Cola acotada entre el renderizado y el hilo que escribe en ffmpeg
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._resultado = None
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def _drain(pipe, chunks):
+        for chunk in iter(lambda: pipe.read(65536), b''):
+            chunks.append(chunk)
+
+    def _write_loop(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            if self._error is not None:
+                continue
+            try:
+                self.process.stdin.write(data)
+                self.bytes_written += len(data)
+            except (BrokenPipeError, OSError) as e:
+                self._error = e
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def write(self, frame, repeticiones=1):
+        """Envía un frame a ffmpeg repetido las veces indicadas (se bloquea si la cola está llena)."""
+        if self._error is not None:
+            raise RuntimeError(f"ffmpeg dejó de aceptar frames: {self._error}")
+
+        if self.input_format == 'rgb':
+            frame = np.ascontiguousarray(frame, dtype=np.uint8)
+            if frame.shape != (self.resolution[1], self.resolution[0], 3):
+                raise ValueError(f"Tamaño de frame inesperado: {frame.shape}")
+            data = frame.tobytes()
+        else:
+            data = bytes(frame)
+
+        #Las repeticiones comparten los mismos bytes: solo se convierte el frame una vez
+        for _ in range(repeticiones):
+            self._queue.put(data)
+        self.frames += repeticiones
+
+    def close(self):
+        """Termina el video y espera a ffmpeg (se puede llamar más de una vez)."""
+        if self._resultado is None:
+            self._queue.put(None)
+            self._writer.join()
+            returncode = self.process.wait()
+            for reader in self._readers:
+                reader.join()
+            self._resultado = VideoResult(returncode, b''.join(self._stdout), b''.join(self._stderr))
+        return self._resultado
+
+    def abort(self):
+        """Detiene ffmpeg sin terminar el video (por ejemplo, si falla el renderizado)."""
+        if self._resultado is None:
+            self.process.terminate()
+        return self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
@@ -1,10 +1,8 @@
 import json
 import os
-import tensorflow as tf
 import numpy as np
-import matplotlib.pyplot as plt
 class RangoVocal:
-    def __init__(self, data):
+    def __init__(self, data, graphs_folder='graphs', record_data_folder='record_data'):
         if isinstance(data, dict):
             self.data = data
         else:
@@ -25,69 +23,115 @@ class RangoVocal:
         self.frecuencia_maxima = 1100  #Umbral máximo de frecuencia para evitar ruido
         self.distancia_minima = 10  #Distancia mínima en Hz entre notas para considerarlas ruido
 
-        #Elimina archivos PNG existentes en la carpeta "graphs"
-        for filename in os.listdir(os.path.join(os.getcwd(), 'graphs')):
-            if filename.endswith(".png"):
-                os.remove(os.path.join(os.getcwd(), 'graphs', filename))
+        self.graphs_folder = graphs_folder  #Carpeta de las gráficas
+        self.record_data_folder = record_data_folder  #Carpeta de los JSON
+
+        #Límites, centros y anchuras de las campanas como arrays (un elemento por rango)
+        self.nombres = list(self.rangos)
+        limites = np.array(list(self.rangos.values()))
+        self.minimos, self.maximos = limites[:, 0], limites[:, 1]
+        self.centros = (self.minimos + self.maximos) / 2
+        self.sigmas = (self.maximos - self.minimos) / 6
+
+        #Notas y frecuencias de los datos, en su orden
+        self.notas = list(self.data)
+        self.frecuencias = np.array([info['frequency'] for info in self.data.values()], dtype=float)
 
     def gaussian_activation(self, x, mu, sigma):
-        """Función de activación gaussiana"""
-        return tf.exp(-0.5 * tf.square((x - mu) / sigma))
+        """Función de activación gaussiana (NumPy, sin TensorFlow)"""
+        return np.exp(-0.5 * np.square((np.asarray(x) - mu) / sigma))
+
+    def activaciones(self, x_vals):
+        """Activación de cada rango (filas) en cada frecuencia de x_vals (columnas)."""
+        return self.gaussian_activation(np.asarray(x_vals)[None, :], self.centros[:, None], self.sigmas[:, None])
+
+    def filtrar_cercanas(self, frecuencias, validas):
+        """Máscara de las frecuencias válidas que no están a menos de distancia_minima de una anterior aceptada."""
+        distancias = np.abs(frecuencias[:, None] - frecuencias[None, :])
+        conflictos = (distancias < self.distancia_minima) & np.tril(validas[:, None] & validas[None, :], -1)
+
+        #Solo las notas con alguna anterior cercana dependen de las decisiones previas
+        aceptadas = validas.copy()
+        for i in np.flatnonzero(conflictos.any(axis=1)):
+            aceptadas[i] = validas[i] and not (conflictos[i] & aceptadas).any()
+        return aceptadas
+
+    def clasificar(self, frecuencias=None):
+        """Rango predominante, notas por rango y frecuencias filtradas (por defecto, las de los datos)."""
+        frecuencias = self.frecuencias if frecuencias is None else np.asarray(frecuencias, dtype=float)
+
+        #Matriz de pertenencia (rangos x notas) dentro de los límites de frecuencia permitidos
+        en_limites = (frecuencias >= self.frecuencia_minima) & (frecuencias <= self.frecuencia_maxima)
+        pertenencia = (frecuencias[None, :] >= self.minimos[:, None]) & (frecuencias[None, :] <= self.maximos[:, None])
+        conteo = (pertenencia & en_limites).sum(axis=1)  #Sirve para saber el rango vocal predominante
+
+        filtradas = self.filtrar_cercanas(frecuencias, en_limites & pertenencia.any(axis=0))
+        return {
+            'rango': self.nombres[int(np.argmax(conteo))],
+            'conteo': dict(zip(self.nombres, conteo.tolist())),
+            'filtradas': frecuencias[filtradas],
+        }
 
-    def generar_campanas(self):
+    def notas_en_rango(self, rango):
+        """Notas del rango ordenadas por frecuencia ascendente."""
+        min_f, max_f = self.rangos[rango]
+        indices = np.flatnonzero((self.frecuencias >= min_f) & (self.frecuencias <= max_f))
+        indices = indices[np.argsort(self.frecuencias[indices], kind='stable')]
+        return [{"note": self.notas[i], "frequency": self.data[self.notas[i]]['frequency']} for i in indices]
+
+    def guardar_rango(self, rango):
+        """Guarda las notas del rango en vocal_range.json."""
+        with open(os.path.join(self.record_data_folder, 'vocal_range.json'), 'w') as json_file:
+            json.dump({rango: self.notas_en_rango(rango)}, json_file, indent=4)
+
+    def generar_campanas(self, graficar=True):
+        """Clasifica las notas, guarda vocal_range.json y, opcionalmente, las gráficas."""
+        resultado = self.clasificar()
+        rango = resultado['rango']
+        self.guardar_rango(rango)
+
+        if graficar:
+            self.graficar_campanas(resultado['filtradas'])
+            self.graficar_rango(rango)
+        return rango
+
+    def graficar_campanas(self, filtered_frequencies):
+        """Gráfica de todos los rangos vocales con las notas filtradas."""
+        from matplotlib.figure import Figure
 
         x_vals = np.linspace(self.frecuencia_minima, self.frecuencia_maxima, 1000)  #Frecuencias desde 50 Hz hasta 1100 Hz
-        plt.figure(figsize=(15, 6))
-
-        conteo_notas = {rango: 0 for rango in self.rangos}
+        fig = Figure(figsize=(15, 6))  #Figura propia (sin el estado global de pyplot)
+        ax = fig.add_subplot()
 
         #Grafica la función de activación para cada rango vocal
-        for rango, (min_f, max_f) in self.rangos.items():
-            centro = (min_f + max_f) / 2
-            sigma = (max_f - min_f) / 6
-            y_vals = self.gaussian_activation(x_vals, centro, sigma)
-
-            #Convierte tensores a arrays para graficar
-            y_vals = y_vals.numpy()
-            plt.plot(x_vals, y_vals, label=f'{rango} [{min_f:.2f} Hz - {max_f:.2f} Hz]')
-
-            #Cuenta las notas dentro del rango vocal y dentro de los límites de frecuencia permitidos
-            for nota, info in self.data.items():
-                freq = info['frequency']
-                if min_f <= freq <= max_f and self.frecuencia_minima <= freq <= self.frecuencia_maxima:
-                    conteo_notas[rango] += 1 #Sirve para saber el rango vocal predominante
-
-        #Filtra las frecuencias dentro de los rangos vocales
-        filtered_frequencies = []
-        for nota, info in self.data.items():
-            freq = info['frequency']
-
-            #Verifica que la frecuencia esté dentro de los límites y no demasiado cerca de otras frecuencias
-            if self.frecuencia_minima <= freq <= self.frecuencia_maxima and any(
-                    min_f <= freq <= max_f for min_f, max_f in self.rangos.values()):
-                if all(abs(freq - f) >= self.distancia_minima for f in filtered_frequencies):
-                    filtered_frequencies.append(freq)
-                    plt.axvline(x=freq, color='black', linestyle=':', linewidth=2)
+        for (rango, (min_f, max_f)), y_vals in zip(self.rangos.items(), self.activaciones(x_vals)):
+            ax.plot(x_vals, y_vals, label=f'{rango} [{min_f:.2f} Hz - {max_f:.2f} Hz]')
+
+        #Todas las notas en una sola llamada
+        ax.vlines(filtered_frequencies, 0, 1, transform=ax.get_xaxis_transform(),
+                  colors='black', linestyles=':', linewidth=2)
 
         #Detalles de la gráfica
-        plt.title('Rangos Vocales')
-        plt.xlabel('Frecuencia (Hz)')
-        plt.ylabel('Activación')
-        plt.legend()
-        plt.grid(True)
+        ax.set_title('Rangos Vocales')
+        ax.set_xlabel('Frecuencia (Hz)')
+        ax.set_ylabel('Activación')
+        ax.legend()
+        ax.grid(True)
 
         #Guarda el gráfico en la carpeta 'graphs'
-        plt.savefig('graphs/vocal_ranges.png')
-        plt.close()
+        fig.savefig(os.path.join(self.graphs_folder, 'vocal_ranges.png'))
 
-        #Encuentra el rango con más notas
-        rango = max(conteo_notas, key=conteo_notas.get)
+    def graficar_rango(self, rango):
+        """Graficar el rango vocal que contiene la mayor cantidad de notas"""
+        from matplotlib.figure import Figure
+        from matplotlib.lines import Line2D
 
-        #Grafica el rango vocal con más notas
-        self.graficar_rango(rango, filtered_frequencies)
+        #Elimina solo las gráficas de rango de ejecuciones anteriores (el resto de "graphs" se conserva)
+        for nombre in self.rangos:
+            ruta = os.path.join(self.graphs_folder, f'{nombre}.png')
+            if os.path.exists(ruta):
+                os.remove(ruta)
 
-    def graficar_rango(self, rango, filtered_frequencies):
-        """Graficar el rango vocal que contiene la mayor cantidad de notas"""
         min_f, max_f = self.rangos[rango]
 
         #Definie los límites de la gráfica extendidos en ±100 Hz
@@ -98,40 +142,31 @@ class RangoVocal:
         centro = (min_f + max_f) / 2
         sigma = (max_f - min_f) / 6
 
-        plt.figure(figsize=(10, 6))
-        y_vals = self.gaussian_activation(x_vals, centro, sigma).numpy()
-        plt.plot(x_vals, y_vals, label=f'{rango} [{min_f:.2f} Hz - {max_f:.2f} Hz]', color='orange')
+        fig = Figure(figsize=(10, 6))
+        ax = fig.add_subplot()
+        y_vals = self.gaussian_activation(x_vals, centro, sigma)
+        curva, = ax.plot(x_vals, y_vals, label=f'{rango} [{min_f:.2f} Hz - {max_f:.2f} Hz]', color='orange')
 
         #Marca las notas en el rango vocal, en rojo si están cerca del centro
-        notas_en_rango = [] #Para guardar las notas del rango vocal
-        for nota, info in self.data.items():
-            freq = info['frequency']
-            if min_f <= freq <= max_f:
-                #Define el color para las notas centrales
-                color = 'red' if abs(freq - centro) <= sigma else 'black'
-                label = f"{nota} ({freq:.2f} Hz)" if color == 'red' else None  #Etiqueta las frecuencias centrales con nombre y frecuencia
-                plt.axvline(x=freq, color=color, linestyle=':', linewidth=2, label=label)
-
-                #Agrega la nota y frecuencia a la lista
-                notas_en_rango.append({"note": nota, "frequency": freq})
-
-        #Ordena las notas por frecuencia ascendente
-        notas_en_rango.sort(key=lambda x: x["frequency"])
+        en_rango = np.flatnonzero((self.frecuencias >= min_f) & (self.frecuencias <= max_f))
+        freqs = self.frecuencias[en_rango]
+        centrales = np.abs(freqs - centro) <= sigma
+        ax.vlines(freqs, 0, 1, transform=ax.get_xaxis_transform(),
+                  colors=np.where(centrales, 'red', 'black'), linestyles=':', linewidth=2)
 
-        # Guarda las notas en un archivo JSON
-        with open(f'record_data/vocal_range.json', 'w') as json_file:
-            json.dump({rango: notas_en_rango}, json_file, indent=4)
+        #Etiqueta las frecuencias centrales con nombre y frecuencia
+        etiquetas = [Line2D([], [], color='red', linestyle=':', linewidth=2, label=f"{self.notas[i]} ({f:.2f} Hz)")
+                     for i, f in zip(en_rango[centrales], freqs[centrales])]
 
         #Detalles de la gráfica
-        plt.title(f'Rango Vocal Predominante: {rango}')
-        plt.xlabel('Frecuencia (Hz)')
-        plt.ylabel('Activación')
-        plt.legend()
-        plt.grid(True)
+        ax.set_title(f'Rango Vocal Predominante: {rango}')
+        ax.set_xlabel('Frecuencia (Hz)')
+        ax.set_ylabel('Activación')
+        ax.legend(handles=[curva] + etiquetas)
+        ax.grid(True)
 
         #Escala de grafica
-        plt.xticks(np.arange(x_min, x_max + 1, 50))
+        ax.set_xticks(np.arange(x_min, x_max + 1, 50))
 
         #Guarda el gráfico en la carpeta 'graphs'
-        plt.savefig(f'graphs/{rango}.png')
-        plt.close()
\ No newline at end of file
+        fig.savefig(os.path.join(self.graphs_folder, f'{rango}.png'))
@@ -0,0 +1,219 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import tqdm
+
+from Audio import FuenteAudio, FuenteMultiple
+from Notes import NoteDetector, NoteStats
+from Spectrum import Spectrogram
+from pipeline import DEFAULT_CONFIG
+
+#Configuración por defecto del análisis: los parámetros de notas de Pipeline
+CONFIG = {clave: DEFAULT_CONFIG[clave] for clave in
+          ('fps', 'fft_window_seconds', 'freq_min', 'freq_max', 'top_notes', 'floor', 'threshold', 'pitch')}
+
+
+def config_key(config):
+    """Huella de la configuración para saber si un resultado sigue siendo válido."""
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def analizar_archivo(audio_file, config=CONFIG):
+    """Detecta las notas de un archivo y devuelve las estadísticas por nota (formato de notes.json)."""
+    inicio = time.perf_counter()
+
+    fuente = FuenteAudio(audio_file, channel=0)
+    spectrogram = Spectrogram(fuente, fuente.sample_rate, config['fps'], config['fft_window_seconds'], cache=False)
+    detector = NoteDetector(spectrogram.xf, config['freq_min'], config['freq_max'],
+                            config['floor'], config['threshold'], pitch=config['pitch'])
+
+    notes = NoteStats()
+    for first, magnitudes in spectrogram.chunks():
+        notes.update_many(detector.detect(magnitudes, config['top_notes']))
+
+    return {
+        'notes': notes.snapshot(),
+        'dominant': notes.dominant(),  #Nota detectada más veces
+        'frames': spectrogram.frame_count,
+        'duration': spectrogram.audio_length,
+        'seconds': time.perf_counter() - inicio,
+    }
+
+
+def analizar_multiple(fuente, config=CONFIG):
+    """Analiza a la vez todas las señales de una FuenteMultiple (canales o tomas, más la mezcla).
+
+    La STFT y la detección de notas se hacen en una sola pasada por bloque para todas las
+    señales; las estadísticas se devuelven por señal.
+    """
+    inicio = time.perf_counter()
+
+    spectrogram = Spectrogram(fuente, fuente.sample_rate, config['fps'], config['fft_window_seconds'], cache=False)
+    detector = NoteDetector(spectrogram.xf, config['freq_min'], config['freq_max'],
+                            config['floor'], config['threshold'], pitch=config['pitch'])
+
+    notes = [NoteStats() for _ in fuente.nombres]
+    for first, magnitudes in spectrogram.chunks():
+        for stats, found in zip(notes, detector.detect(magnitudes, config['top_notes'])):
+            stats.update_many(found)
+
+    return {
+        'signals': {
+            nombre: {'notes': stats.snapshot(), 'dominant': stats.dominant()}
+            for nombre, stats in zip(fuente.nombres, notes)
+        },
+        'frames': spectrogram.frame_count,
+        'duration': spectrogram.audio_length,
+        'seconds': time.perf_counter() - inicio,
+    }
+
+
+def buscar_archivos(root):
+    """Recorre el dataset: cada carpeta tiene el nombre de la nota de sus archivos (p. ej. A#2/A#2-13-npn.wav)."""
+    for label in sorted(os.listdir(root)):
+        folder = os.path.join(root, label)
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            if filename.lower().endswith('.wav'):
+                yield label, os.path.join(folder, filename)
+
+
+def _tarea(args):
+    label, path, relpath, config, key = args
+    stat = os.stat(path)
+    registro = {
+        'file': relpath,
+        'label': label,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'config': key,
+    }
+    try:
+        registro.update(analizar_archivo(path, config))
+        registro['error'] = None
+    except Exception as e:
+        registro.update({'notes': {}, 'dominant': None, 'frames': 0, 'duration': 0.0, 'seconds': 0.0,
+                         'error': f"{type(e).__name__}: {e}"})
+    return registro
+
+
+#Lectura y escritura de resultados: Parquet si pyarrow está disponible, JSONL si no
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def cargar_resultados(path):
+    if not os.path.exists(path):
+        return {}
+    if path.endswith('.parquet'):
+        pa = _pyarrow()
+        if pa is None:
+            return {}
+        registros = pa.parquet.read_table(path).to_pylist()
+        for registro in registros:
+            registro['notes'] = json.loads(registro['notes'])
+    else:
+        with open(path) as f:
+            registros = [json.loads(line) for line in f if line.strip()]
+    return {registro['file']: registro for registro in registros}
+
+
+def guardar_resultados(path, registros):
+    tmp = path + '.tmp'
+    if path.endswith('.parquet'):
+        pa = _pyarrow()
+        filas = [dict(registro, notes=json.dumps(registro['notes'])) for registro in registros]
+        pa.parquet.write_table(pa.Table.from_pylist(filas), tmp)
+    else:
+        with open(tmp, 'w') as f:
+            for registro in registros:
+                f.write(json.dumps(registro) + '\n')
+    os.replace(tmp, path)  #Nunca deja un archivo de resultados a medias
+
+
+def procesar_dataset(root, output, workers=None, force=False, config=CONFIG):
+    """Analiza todos los archivos del dataset que no tengan un resultado actualizado."""
+    key = config_key(config)
+    previos = {} if force else cargar_resultados(output)
+
+    registros = {}
+    pendientes = []
+    for label, path in buscar_archivos(root):
+        relpath = os.path.relpath(path, root)
+        stat = os.stat(path)
+        previo = previos.get(relpath)
+        if (previo and previo['mtime_ns'] == stat.st_mtime_ns and previo['size'] == stat.st_size
+                and previo['config'] == key and not previo.get('error')):
+            registros[relpath] = previo  #Resultado al día
+        else:
+            pendientes.append((label, path, relpath, config, key))
+
+    print(f"Archivos: {len(registros) + len(pendientes)} ({len(registros)} al día, {len(pendientes)} por analizar)")
+
+    inicio = time.perf_counter()
+    if pendientes:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_tarea, tarea) for tarea in pendientes]
+            for future in tqdm.tqdm(as_completed(futures), total=len(futures)):
+                registro = future.result()
+                registros[registro['file']] = registro
+
+    guardar_resultados(output, [registros[k] for k in sorted(registros)])
+
+    errores = [r for r in registros.values() if r.get('error')]
+    print(f"Analizados {len(pendientes)} archivos en {time.perf_counter() - inicio:.2f} s")
+    for registro in errores:
+        print(f"\033[91mError en {registro['file']}: {registro['error']}\033[0m")
+    return registros
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detección de notas por lotes sobre guitar_dataset")
+    parser.add_argument('root', nargs='?', default='guitar_dataset', help="Carpeta del dataset")
+    parser.add_argument('-o', '--output', default=None,
+                        help="Archivo de resultados (.parquet o .jsonl; por defecto según pyarrow)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Procesos de análisis")
+    parser.add_argument('--force', action='store_true', help="Analiza de nuevo todos los archivos")
+    parser.add_argument('--canales', metavar='WAV', help="Analiza todos los canales de un archivo en lugar del dataset")
+    parser.add_argument('--tomas', metavar='WAV', nargs='+', help="Analiza varias tomas a la vez en lugar del dataset")
+    parser.add_argument('--mezcla', choices=FuenteMultiple.MEZCLAS, default=None,
+                        help="Añade la mezcla de las señales (media o suma) con --canales o --tomas")
+    args = parser.parse_args(argv)
+
+    if args.canales or args.tomas:
+        fuente = (FuenteMultiple.canales(args.canales, args.mezcla) if args.canales
+                  else FuenteMultiple.tomas(args.tomas, mezcla=args.mezcla))
+        resultado = analizar_multiple(fuente)
+        output = args.output or os.path.join('record_data', 'signals.json')
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(resultado, f, indent=4)
+        for nombre, datos in resultado['signals'].items():
+            print(f"{nombre}: {datos['dominant']}")
+        print(f"Analizadas {len(resultado['signals'])} señales en {resultado['seconds']:.2f} s")
+        return
+
+    output = args.output
+    if output is None:
+        extension = 'parquet' if _pyarrow() is not None else 'jsonl'
+        output = os.path.join('record_data', f'guitar_dataset.{extension}')
+    elif output.endswith('.parquet') and _pyarrow() is None:
+        output = os.path.splitext(output)[0] + '.jsonl'
+        print(f"pyarrow no está disponible, se usa {output}")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    procesar_dataset(args.root, output, args.workers, args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from Audio import FuenteAudio
+from Notes import NOTE_NAMES, PITCH_METHODS, NoteDetector, NoteStats
+from Spectrum import Spectrogram
+from batch import CONFIG, buscar_archivos
+from metrics import rss_mb
+
+#Tolerancias al comparar con una línea base
+TOLERANCIAS = {
+    'accuracy': 0.01,  #Caída absoluta máxima de cualquier precisión
+    'throughput': 0.20,  #Caída relativa máxima de frames/s y segundos de audio/s
+    'peak_rss': 0.20,  #Aumento relativo máximo de la memoria máxima
+}
+
+
+#Módulos que se importan en cada proceso de análisis y tiempo máximo de importación (s)
+MODULOS_ANALISIS = ['Audio', 'Spectrum', 'Notes', 'Render', 'Vocal', 'tonality', 'Chord', 'Record', 'batch']
+PRESUPUESTO_IMPORTACION = 1.0
+
+#Dependencias pesadas que solo deben cargar las etapas que las usan
+IMPORTACIONES_PESADAS = ['tensorflow', 'librosa', 'plotly', 'matplotlib', 'sounddevice']
+
+
+def comprobar_importaciones(modulos=MODULOS_ANALISIS, presupuesto=PRESUPUESTO_IMPORTACION):
+    """Importa cada módulo en un proceso nuevo y devuelve los que superan el presupuesto
+    o cargan dependencias pesadas al importarse."""
+    codigo = (
+        "import json, sys, time\n"
+        "inicio = time.perf_counter()\n"
+        "import {modulo}\n"
+        "segundos = time.perf_counter() - inicio\n"
+        "pesadas = [m for m in {pesadas!r} if m in sys.modules]\n"
+        "print(json.dumps({{'segundos': segundos, 'pesadas': pesadas}}))\n"
+    )
+    directorio = os.path.dirname(os.path.abspath(__file__))
+
+    resultados = {}
+    fallos = []
+    for modulo in modulos:
+        salida = subprocess.run([sys.executable, '-c', codigo.format(modulo=modulo, pesadas=IMPORTACIONES_PESADAS)],
+                                cwd=directorio, capture_output=True, text=True)
+        if salida.returncode != 0:
+            fallos.append(f"{modulo}: no se pudo importar ({salida.stderr.strip().splitlines()[-1:]})")
+            continue
+
+        resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+        resultados[modulo] = resultado
+        if resultado['segundos'] > presupuesto:
+            fallos.append(f"{modulo}: {resultado['segundos']:.2f} s > {presupuesto:.2f} s")
+        if resultado['pesadas']:
+            fallos.append(f"{modulo}: importa {', '.join(resultado['pesadas'])}")
+    return resultados, fallos
+
+
+def parse_note(name):
+    """Separa un nombre de nota ('A#2') en clase de altura (0-11) y octava."""
+    match = re.match(r'^([A-G]#?)(-?\d+)$', name or '')
+    if not match:
+        return None
+    return NOTE_NAMES.index(match.group(1)), int(match.group(2))
+
+
+def comparar_nota(detectada, esperada):
+    """Clasifica una detección: 'exact', 'octave' (misma clase, otra octava) o 'wrong'."""
+    d, e = parse_note(detectada), parse_note(esperada)
+    if d is None or e is None:
+        return 'wrong'
+    if d == e:
+        return 'exact'
+    if d[0] == e[0]:
+        return 'octave'
+    return 'wrong'
+
+
+def medir_archivo(audio_file, config, stages):
+    """Analiza un archivo acumulando el tiempo de cada etapa; devuelve la nota dominante y las notas por frame."""
+    t = time.perf_counter()
+    fuente = FuenteAudio(audio_file, channel=0)
+    spectrogram = Spectrogram(fuente, fuente.sample_rate, config['fps'], config['fft_window_seconds'])
+    detector = NoteDetector(spectrogram.xf, config['freq_min'], config['freq_max'],
+                            config['floor'], config['threshold'], pitch=config['pitch'])
+    stages['load'] += time.perf_counter() - t
+
+    t = time.perf_counter()
+    magnitudes, mx = spectrogram.compute()
+    stages['stft'] += time.perf_counter() - t
+
+    t = time.perf_counter()
+    found_frames = detector.detect(magnitudes, config['top_notes'])
+    stages['notes'] += time.perf_counter() - t
+
+    t = time.perf_counter()
+    notes = NoteStats()
+    notes.update_many(found_frames)
+    dominant = notes.dominant()
+    stages['stats'] += time.perf_counter() - t
+
+    return dominant, found_frames, spectrogram.frame_count, spectrogram.audio_length
+
+
+def ejecutar(root, config=CONFIG, limit=None):
+    """Ejecuta el benchmark sobre el dataset y devuelve el informe."""
+    archivos = list(buscar_archivos(root))
+    if limit:
+        #Toma los primeros archivos de cada carpeta para mantener todas las notas
+        por_nota = defaultdict(list)
+        for label, path in archivos:
+            if len(por_nota[label]) < limit:
+                por_nota[label].append((label, path))
+        archivos = [x for lista in por_nota.values() for x in lista]
+
+    stages = defaultdict(float)
+    resultados = defaultdict(int)
+    frames_resultados = defaultdict(int)
+    total_frames = 0
+    total_audio = 0.0
+
+    inicio = time.perf_counter()
+    for label, path in archivos:
+        dominant, found_frames, frames, duration = medir_archivo(path, config, stages)
+        resultados[comparar_nota(dominant, label)] += 1
+        for found in found_frames:
+            if found:
+                frames_resultados[comparar_nota(found[0][1], label)] += 1
+        total_frames += frames
+        total_audio += duration
+    elapsed = time.perf_counter() - inicio
+
+    def precision(conteo):
+        total = sum(conteo.values())
+        if not total:
+            return {'exact': 0.0, 'octave_error': 0.0, 'pitch_class': 0.0}
+        return {
+            'exact': conteo['exact'] / total,  #Nota y octava correctas
+            'octave_error': conteo['octave'] / total,  #Nota correcta en otra octava
+            'pitch_class': (conteo['exact'] + conteo['octave']) / total,  #Nota correcta sin importar la octava
+        }
+
+    return {
+        'config': config,
+        'files': len(archivos),
+        'frames': total_frames,
+        'audio_seconds': total_audio,
+        'accuracy': {
+            'files': precision(resultados),  #Nota dominante de cada archivo
+            'frames': precision(frames_resultados),  #Nota principal de cada frame con notas
+        },
+        'throughput': {
+            'frames_per_second': total_frames / elapsed if elapsed else 0.0,
+            'audio_seconds_per_second': total_audio / elapsed if elapsed else 0.0,
+        },
+        'stages': dict(stages),
+        'seconds': elapsed,
+        'peak_rss_mb': rss_mb(),
+    }
+
+
+def comparar(informe, base, tolerancias=TOLERANCIAS):
+    """Devuelve la lista de regresiones del informe respecto a la línea base."""
+    regresiones = []
+    for nivel in ('files', 'frames'):
+        for metrica in ('exact', 'pitch_class'):
+            actual = informe['accuracy'][nivel][metrica]
+            previo = base['accuracy'][nivel][metrica]
+            if actual < previo - tolerancias['accuracy']:
+                regresiones.append(f"Precisión {nivel}/{metrica}: {actual:.3f} < {previo:.3f}")
+
+    for metrica, actual in informe['throughput'].items():
+        previo = base['throughput'][metrica]
+        if actual < previo * (1 - tolerancias['throughput']):
+            regresiones.append(f"Rendimiento {metrica}: {actual:.1f} < {previo:.1f}")
+
+    if informe['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerancias['peak_rss']):
+        regresiones.append(f"Memoria máxima: {informe['peak_rss_mb']:.1f} MB > {base['peak_rss_mb']:.1f} MB")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de precisión y velocidad con guitar_dataset")
+    parser.add_argument('root', nargs='?', default='guitar_dataset', help="Carpeta del dataset")
+    parser.add_argument('--limit', type=int, default=None, help="Archivos por nota (por defecto todos)")
+    parser.add_argument('--save-baseline', metavar='JSON', help="Guarda el informe como línea base")
+    parser.add_argument('--compare', metavar='JSON', help="Compara con una línea base y falla si hay regresiones")
+    parser.add_argument('--import-budget', type=float, nargs='?', const=PRESUPUESTO_IMPORTACION, default=None,
+                        metavar='SEGUNDOS', help="Solo comprueba el tiempo de importación de los módulos de análisis")
+    parser.add_argument('--window', type=float, default=CONFIG['fft_window_seconds'], help="FFT_WINDOW_SECONDS")
+    parser.add_argument('--top-notes', type=int, default=CONFIG['top_notes'], help="TOP_NOTES")
+    parser.add_argument('--floor', type=float, default=CONFIG['floor'], help="Magnitud mínima de una nota")
+    parser.add_argument('--threshold', type=float, default=CONFIG['threshold'], help="Umbral de inclusión")
+    parser.add_argument('--pitch', choices=PITCH_METHODS, default=CONFIG['pitch'], help="Estimación de la frecuencia")
+    args = parser.parse_args(argv)
+
+    if args.import_budget is not None:
+        resultados, fallos = comprobar_importaciones(presupuesto=args.import_budget)
+        for modulo, resultado in resultados.items():
+            print(f"{modulo}: {resultado['segundos'] * 1000:.0f} ms")
+        for fallo in fallos:
+            print(f"\033[91mImportación: {fallo}\033[0m")
+        sys.exit(1 if fallos else 0)
+
+    config = dict(CONFIG, fft_window_seconds=args.window, top_notes=args.top_notes,
+                  floor=args.floor, threshold=args.threshold, pitch=args.pitch)
+    informe = ejecutar(args.root, config, args.limit)
+    print(json.dumps(informe, indent=4))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or '.', exist_ok=True)
+        with open(args.save_baseline, 'w') as f:
+            json.dump(informe, f, indent=4)
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        regresiones = comparar(informe, base)
+        for regresion in regresiones:
+            print(f"\033[91mRegresión: {regresion}\033[0m")
+        if regresiones:
+            sys.exit(1)
+        print("Sin regresiones respecto a la línea base")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+#Parámetros de configuración de los que depende cada etapa
+CLAVES_ETAPA = {
+    'spectrum': ['fps', 'fft_window_seconds', 'channel', 'freq_max'],  #freq_max: bins que se guardan
+    'notes': ['freq_min', 'freq_max', 'floor', 'threshold', 'top_notes', 'pitch'],
+    'video': ['resolution', 'render_backend', 'render_scale', 'chord_overlay', 'chord_penalty', 'chord_min_score',
+              'skip_tolerance'],
+    'vocal_range': ['vocal_plots'],
+}
+
+#Etapa de la que depende cada una
+ETAPA_ANTERIOR = {
+    'spectrum': None,
+    'notes': 'spectrum',
+    'video': 'notes',
+    'vocal_range': 'notes',
+}
+
+#Módulos cuyo código afecta a cada etapa (forman parte de la clave). La matriz del espectro
+#se recorta y se convierte a float32 en pipeline.py hasta el límite del chromagram de Chord.py
+MODULOS_ETAPA = {
+    'spectrum': ['Audio.py', 'Spectrum.py', 'pipeline.py', 'Chord.py'],
+    'notes': ['Notes.py'],
+    'video': ['Render.py', 'Video.py', 'Chord.py'],
+    'vocal_range': ['Vocal.py'],
+}
+
+
+def hash_archivo(ruta, bloque=1 << 20):
+    """SHA-256 del contenido de un archivo."""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for chunk in iter(lambda: f.read(bloque), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def version_codigo(modulos):
+    """Huella del código fuente de los módulos indicados."""
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256()
+    for modulo in modulos:
+        with open(os.path.join(directorio, modulo), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+class CacheResultados:
+    """Caché en disco de espectros, notas y artefactos, direccionada por contenido.
+
+    Cada entrada es una carpeta cuya clave combina el hash del audio, los parámetros de
+    la etapa y de las anteriores y la versión del código, de modo que un cambio de
+    configuración solo invalida las etapas que dependen de él. Las entradas menos
+    usadas recientemente se eliminan cuando se supera max_bytes.
+    """
+
+    def __init__(self, folder='cache', max_bytes=2 * 1024 ** 3):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+
+    def claves(self, audio_hash, config):
+        """Clave de cada etapa para un audio y una configuración."""
+        claves = {}
+        for etapa, parametros in CLAVES_ETAPA.items():
+            anterior = ETAPA_ANTERIOR[etapa]
+            datos = {
+                'etapa': etapa,
+                'anterior': claves[anterior] if anterior else audio_hash,
+                'config': {p: config[p] for p in parametros},
+                'codigo': version_codigo(MODULOS_ETAPA[etapa]),
+            }
+            claves[etapa] = hashlib.sha256(json.dumps(datos, sort_keys=True).encode()).hexdigest()[:24]
+        return claves
+
+    def _ruta(self, clave):
+        return os.path.join(self.folder, clave)
+
+    def _usar(self, clave):
+        #Marca la entrada como usada recientemente (LRU por fecha de modificación)
+        ahora = time.time()
+        os.utime(self._ruta(clave), (ahora, ahora))
+
+    def contiene(self, clave):
+        return os.path.isdir(self._ruta(clave))
+
+    def _escribir(self, clave, escribir):
+        #Escribe en una carpeta temporal y la renombra, para no dejar entradas a medias. Si la
+        #entrada ya existe (otro proceso la escribió antes) se conserva: el contenido es el mismo
+        #y otro proceso puede estar leyéndola
+        tmp = self._ruta(clave) + f'.tmp{os.getpid()}'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        escribir(tmp)
+        try:
+            if self.contiene(clave):
+                raise FileExistsError(self._ruta(clave))
+            os.rename(tmp, self._ruta(clave))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.limpiar()
+
+    #Las lecturas devuelven None si la entrada no existe o desaparece mientras se lee
+    #(otro proceso puede eliminarla en limpiar() en cualquier momento)
+
+    #Espectro: matriz de magnitudes comprimida
+    def cargar_espectro(self, clave):
+        try:
+            self._usar(clave)
+            with np.load(os.path.join(self._ruta(clave), 'spectrum.npz')) as datos:
+                return datos['magnitudes'], float(datos['mx'])
+        except FileNotFoundError:
+            return None
+
+    def guardar_espectro(self, clave, magnitudes, mx):
+        self._escribir(clave, lambda carpeta: np.savez_compressed(
+            os.path.join(carpeta, 'spectrum.npz'), magnitudes=magnitudes.astype(np.float32), mx=mx))
+
+    #Datos JSON (notas por frame y estadísticas)
+    def cargar_json(self, clave):
+        try:
+            self._usar(clave)
+            with open(os.path.join(self._ruta(clave), 'data.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def guardar_json(self, clave, datos):
+        def escribir(carpeta):
+            with open(os.path.join(carpeta, 'data.json'), 'w') as f:
+                json.dump(datos, f)
+        self._escribir(clave, escribir)
+
+    #Artefactos: archivos generados (video, gráficas, JSON de resultados)
+    def restaurar_archivos(self, clave, destinos):
+        """Copia los archivos de la entrada a sus carpetas de destino ({nombre: carpeta})."""
+        carpeta = self._ruta(clave)
+        try:
+            self._usar(clave)
+            with open(os.path.join(carpeta, 'files.json')) as f:
+                archivos = json.load(f)
+            rutas = []
+            for nombre, tipo in archivos.items():
+                destino = os.path.join(destinos[tipo], nombre)
+                shutil.copyfile(os.path.join(carpeta, nombre), destino)
+                rutas.append(destino)
+        except FileNotFoundError:
+            return None
+        return rutas
+
+    def guardar_archivos(self, clave, rutas):
+        """Guarda archivos generados ({ruta: tipo de carpeta})."""
+        def escribir(carpeta):
+            archivos = {}
+            for ruta, tipo in rutas.items():
+                shutil.copyfile(ruta, os.path.join(carpeta, os.path.basename(ruta)))
+                archivos[os.path.basename(ruta)] = tipo
+            with open(os.path.join(carpeta, 'files.json'), 'w') as f:
+                json.dump(archivos, f)
+        self._escribir(clave, escribir)
+
+    def limpiar(self):
+        """Elimina las entradas menos usadas hasta quedar por debajo de max_bytes."""
+        entradas = []
+        total = 0
+        for entrada in os.scandir(self.folder):
+            if not entrada.is_dir() or '.tmp' in entrada.name:
+                continue
+            try:
+                tamano = sum(f.stat().st_size for f in os.scandir(entrada.path) if f.is_file())
+                entradas.append((entrada.stat().st_mtime, tamano, entrada.path))
+            except FileNotFoundError:
+                continue  #Eliminada por otro proceso
+            total += tamano
+
+        for _, tamano, ruta in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(ruta, ignore_errors=True)
+            total -= tamano
@@ -0,0 +1,108 @@
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+
+def rss_mb(who=resource.RUSAGE_SELF):
+    """Memoria residente máxima en MB del proceso (o de sus hijos con RUSAGE_CHILDREN)."""
+    #ru_maxrss está en KB en Linux y en bytes en macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _cpu_children():
+    #CPU de los procesos hijos ya terminados (pool de renderizado, ffmpeg)
+    uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return uso.ru_utime + uso.ru_stime
+
+
+class Metricas:
+    """Tiempos, memoria y contadores por etapa del análisis.
+
+    profiler puede ser None, 'cprofile' o 'pyinstrument' (si está instalado).
+    """
+
+    def __init__(self, profiler=None):
+        self.etapas = {}
+        self.orden = []
+        self.profiler = profiler
+        self._profiler = None
+        self._inicio = time.perf_counter()
+        self._cpu_inicio = time.process_time()
+
+    @contextmanager
+    def etapa(self, nombre):
+        """Mide el tiempo de pared, la CPU propia y de los hijos y la memoria máxima de una etapa."""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        cpu_children = _cpu_children()
+        rss = rss_mb()
+        try:
+            yield self.etapas.setdefault(nombre, {})
+        finally:
+            datos = self.etapas[nombre]
+            datos['wall_seconds'] = time.perf_counter() - wall
+            datos['cpu_seconds'] = time.process_time() - cpu
+            datos['children_cpu_seconds'] = _cpu_children() - cpu_children
+            datos['peak_rss_mb'] = rss_mb()
+            datos['rss_growth_mb'] = datos['peak_rss_mb'] - rss
+            if 'frames' in datos and datos['wall_seconds'] > 0:
+                datos['frames_per_second'] = datos['frames'] / datos['wall_seconds']
+            if nombre not in self.orden:
+                self.orden.append(nombre)
+
+    def agregar(self, nombre, **valores):
+        """Añade contadores a una etapa (frames, bytes escritos, ...)."""
+        self.etapas.setdefault(nombre, {}).update(valores)
+
+    def iniciar_profiler(self):
+        """Inicia el profiler o lo reanuda: un mismo profiler acumula todas las etapas."""
+        if self.profiler is None:
+            return
+        if self._profiler is None:
+            if self.profiler == 'cprofile':
+                import cProfile
+                self._profiler = cProfile.Profile()
+            elif self.profiler == 'pyinstrument':
+                from pyinstrument import Profiler
+                self._profiler = Profiler()
+            else:
+                raise ValueError(f"Profiler no soportado: {self.profiler}")
+        if self.profiler == 'cprofile':
+            self._profiler.enable()
+        else:
+            self._profiler.start()  #pyinstrument combina las sesiones de cada start/stop
+
+    def detener_profiler(self, folder):
+        """Pausa el profiler y guarda en folder (profile.prof o profile.html) todo lo acumulado."""
+        if self._profiler is None:
+            return None
+        if self.profiler == 'cprofile':
+            self._profiler.disable()
+            ruta = os.path.join(folder, 'profile.prof')
+            self._profiler.dump_stats(ruta)
+        else:
+            self._profiler.stop()
+            ruta = os.path.join(folder, 'profile.html')
+            with open(ruta, 'w') as f:
+                f.write(self._profiler.output_html())
+        return ruta
+
+    def informe(self):
+        return {
+            'stages': {nombre: self.etapas[nombre] for nombre in self.orden},
+            'total': {
+                'wall_seconds': time.perf_counter() - self._inicio,
+                'cpu_seconds': time.process_time() - self._cpu_inicio,
+                'children_cpu_seconds': _cpu_children(),
+                'peak_rss_mb': rss_mb(),
+                'children_peak_rss_mb': rss_mb(resource.RUSAGE_CHILDREN),
+            },
+        }
+
+    def guardar(self, ruta):
+        with open(ruta, 'w') as f:
+            json.dump(self.informe(), f, indent=4)
@@ -0,0 +1,406 @@
+import json
+import os
+
+import numpy as np
+
+from Audio import FuenteAudio
+from Chord import FREQ_MAX_CHROMA, Chord, ChromaFFT
+from cache import CacheResultados, hash_archivo
+from Notes import NoteDetector, NoteStats
+from Render import RenderPool, frames_con_cambios
+from Spectrum import Spectrogram
+from Video import VideoResult, VideoStream, generar_video
+from metrics import Metricas
+from Vocal import RangoVocal
+from tonality import PrediccionTonalidad, seguir_tonalidad
+
+#Configuración por defecto
+DEFAULT_CONFIG = {
+    'fps': 30,  #Fotogramas
+    'fft_window_seconds': 0.25,  #Duración en segundos de cada ventana FFT
+    'freq_min': 50,  #Frecuencia mínima
+    'freq_max': 1100,  #Frecuencia máxima
+    'top_notes': 5,  #Número máximo de notas a detectar
+    'floor': 0.05,  #Magnitud mínima de una nota (con "hps", del espectro armónico)
+    'threshold': 0.6,  #Magnitud a partir de la cual la nota se añade siempre (con "hps", del espectro armónico)
+    'pitch': 'hps',  #Estimación de la frecuencia de cada pico: "bin", "parabolic" o "hps"
+    'channel': 0,  #Canal del WAV que se analiza
+    'resolution': (1280, 720),  #Resolución del gráfico
+    'render_scale': 2,  #Escala de exportación de Plotly
+    'render_workers': os.cpu_count(),  #Procesos para renderizar los frames
+    'render_backend': 'plotly',  #Renderizador de frames: "plotly" (más detallado) o "agg" (rápido)
+    'stream_video': True,  #Envía los frames directamente a ffmpeg sin pasar por la carpeta "frames"
+    'skip_tolerance': None,  #Solo renderiza los frames que cambian más que esta fracción del eje (None: todos)
+    'frame_folder': 'frames',
+    'graphs_folder': 'graphs',
+    'record_data_folder': 'record_data',
+    'vocal_plots': True,  #Gráficas del rango vocal (vocal_range.json se guarda siempre)
+    'chord_overlay': False,  #Muestra el acorde de cada frame en el video
+    'chord_penalty': 1.0,  #Penalización por cambio de acorde (suavizado de Viterbi)
+    'chord_min_score': 0.6,  #Similitud mínima para no marcar el frame como "sin acorde"
+    'key_method': 'escalas',  #Puntuación de tonalidades: "escalas" (notas en la escala) o "krumhansl"
+    'key_window_seconds': 8.0,  #Ventana del seguimiento de tonalidad a lo largo del tiempo (None lo desactiva)
+    'key_tracking_method': 'krumhansl',  #Puntuación en cada ventana ("escalas" empata con pocas notas distintas)
+    'metrics': True,  #Guarda metrics.json junto a notes.json
+    'profiler': None,  #None, "cprofile" o "pyinstrument"
+    'cache_folder': 'cache',  #Caché de espectros, notas y artefactos (None la desactiva)
+    'cache_max_bytes': 2 * 1024 ** 3,  #Tamaño máximo de la caché; se eliminan las entradas menos usadas
+}
+
+#Etapas en orden de ejecución
+STAGES = ['load', 'stft', 'notes', 'stats', 'chords', 'render', 'encode', 'vocal_range', 'tonality']
+
+
+class Pipeline:
+    """Análisis completo de un archivo de audio con configuración y estado propios.
+
+    Cada instancia guarda sus resultados intermedios, así que se pueden analizar varios
+    archivos a la vez en el mismo proceso o en procesos distintos.
+    """
+
+    def __init__(self, audio_file, config=None, **overrides):
+        self.audio_file = os.path.abspath(audio_file)
+        self.config = dict(DEFAULT_CONFIG, **(config or {}), **overrides)
+
+        #Estado de cada etapa
+        self.fuente = None
+        self.spectrogram = None
+        self.magnitudes = None  #Solo los bins que usan el video y los acordes, en float32
+        self.chromagram = None  #Chromagram de los acordes, calculado en la pasada de las notas
+        self.mx = None
+        self.notas_frames = None
+        self.notes = None
+        self.notas_dict = None
+        self.video_result = None
+        self.rango = None
+        self.acordes = None
+        self.acordes_frames = None
+        self.tonalidades = None
+        self.seguimiento_tonalidad = None
+        self.render_pool = None
+        self._frames = None
+        self._duraciones = None  #Repeticiones de cada frame renderizado al omitir frames sin cambios
+        self._claves = None  #Clave de caché de cada etapa
+        self._video_en_cache = False
+        self._notas_cache = None  #Notas por frame leídas de la caché
+        self._etapas = set()  #Etapas pedidas en la llamada actual a run()
+        self.cache = None
+        if self.config['cache_folder']:
+            self.cache = CacheResultados(self.config['cache_folder'], self.config['cache_max_bytes'])
+        self.metricas = Metricas(self.config['profiler'])
+
+    def _folder(self, key):
+        folder = self.config[key]
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    @property
+    def xf(self):
+        return self.spectrogram.xf
+
+    @property
+    def bins(self):
+        """Bins del espectro que se guardan: hasta freq_max (video) y el límite del chromagram."""
+        limite = max(self.config['freq_max'], FREQ_MAX_CHROMA)
+        return min(int(np.searchsorted(self.xf, limite, side='right')) + 1, len(self.xf))
+
+    @property
+    def xf_espectro(self):
+        """Frecuencias de las columnas de magnitudes."""
+        return self.xf[:self.bins]
+
+    def load(self):
+        """Abre el WAV (mapeado en memoria) y prepara el espectrograma."""
+        if not os.path.exists(self.audio_file):
+            raise FileNotFoundError(f"El archivo de audio no se encuentra en la ruta especificada: {self.audio_file}")
+
+        self.fuente = FuenteAudio(self.audio_file, channel=self.config['channel'])
+        #Sin caché de la matriz completa: cada etapa recorre el espectro por bloques
+        self.spectrogram = Spectrogram(self.fuente, self.fuente.sample_rate, self.config['fps'],
+                                       self.config['fft_window_seconds'], cache=False)
+        if self.cache is not None:
+            self._claves = self.cache.claves(hash_archivo(self.audio_file), self.config)
+        self.metricas.agregar('load', bytes_read=os.path.getsize(self.audio_file),
+                              audio_seconds=self.spectrogram.audio_length)
+
+    def _en_cache(self, etapa):
+        return self.cache is not None and self.cache.contiene(self._claves[etapa])
+
+    #Las entradas de la caché pueden desaparecer entre contiene() y la lectura (otro proceso
+    #las elimina al limpiar): una lectura que devuelve None se trata como un fallo de caché
+    def _cargar(self, metodo, etapa):
+        if self.cache is None:
+            return None
+        return getattr(self.cache, metodo)(self._claves[etapa])
+
+    def stft(self):
+        """Amplitud máxima global (primera pasada por bloques sobre el audio).
+
+        Las magnitudes normalizadas no se guardan enteras: en la segunda pasada se detectan
+        las notas bloque a bloque y, si run() va a necesitarlos, se calculan a la vez el
+        chromagram de los acordes y la matriz recortada del video.
+        """
+        self._notas_cache = self._cargar('cargar_json', 'notes')
+        if self._notas_cache is not None:
+            self.mx = self._notas_cache['mx']
+            self.metricas.agregar('stft', cached=True)
+            return
+        self.mx = self.spectrogram.compute_max()
+        self.metricas.agregar('stft', frames=self.spectrogram.frame_count)
+
+    def _bloques(self):
+        #Magnitudes normalizadas por bloques (frames x todos los bins)
+        return (block for _, block in self.spectrogram.chunks(self.mx))
+
+    def _nueva_matriz(self):
+        return np.empty((self.spectrogram.frame_count, self.bins), dtype=np.float32)
+
+    def _guardar_espectro(self, magnitudes, etapa):
+        self.magnitudes = magnitudes
+        if self.cache is not None and not self._en_cache('spectrum'):
+            self.cache.guardar_espectro(self._claves['spectrum'], self.magnitudes, self.mx)
+        self.metricas.agregar(etapa, spectrum_bins=self.bins, spectrum_bytes=self.magnitudes.nbytes)
+
+    def _espectro(self, etapa):
+        """Matriz (frames x bins) en float32 para el video y los acordes.
+
+        Normalmente ya la ha llenado detect_notes; si no (notas de la caché o etapas pedidas
+        en otra llamada a run()), se lee de la caché o se hace otra pasada por bloques.
+        """
+        if self.magnitudes is not None:
+            return
+        espectro = self._cargar('cargar_espectro', 'spectrum')
+        if espectro is not None:
+            self.magnitudes, self.mx = espectro
+            self.metricas.agregar(etapa, spectrum_cached=True)
+            return
+
+        if self.mx is None:
+            self.mx = self.spectrogram.compute_max()
+        bins = self.bins
+        magnitudes = self._nueva_matriz()
+        for first, block in self.spectrogram.chunks(self.mx):
+            magnitudes[first:first + len(block)] = block[:, :bins]
+        self._guardar_espectro(magnitudes, etapa)
+
+    def detect_notes(self):
+        """Notas principales de cada frame."""
+        if self._notas_cache is None:
+            self._notas_cache = self._cargar('cargar_json', 'notes')
+        if self._notas_cache is not None:
+            self.notas_frames = self._notas_cache['notas_frames']
+            self.metricas.agregar('notes', frames=len(self.notas_frames), cached=True)
+            return
+
+        #Segunda pasada por bloques con todos los bins (HPS usa los armónicos por encima de freq_max).
+        #En la misma pasada se calculan el chromagram y la matriz del video si se van a usar
+        detector = NoteDetector(self.xf, self.config['freq_min'], self.config['freq_max'],
+                                self.config['floor'], self.config['threshold'], pitch=self.config['pitch'])
+        render = 'render' in self._etapas and not self._en_cache('video')
+        croma = None
+        if self.chromagram is None and ('chords' in self._etapas or (render and self.config['chord_overlay'])):
+            croma = ChromaFFT(self.xf)
+        matriz = self._nueva_matriz() if render and self.magnitudes is None else None
+        bins = self.bins
+
+        self.notas_frames = []
+        bloques_croma = []
+        for first, block in self.spectrogram.chunks(self.mx):
+            self.notas_frames.extend(detector.detect(block, self.config['top_notes']))
+            if croma is not None:
+                bloques_croma.append(croma.chroma(block))
+            if matriz is not None:
+                matriz[first:first + len(block)] = block[:, :bins]
+
+        if croma is not None:
+            self.chromagram = np.hstack(bloques_croma) if bloques_croma else np.zeros((12, 0))
+        if matriz is not None:
+            self._guardar_espectro(matriz, 'notes')
+        if self.cache is not None:
+            self.cache.guardar_json(self._claves['notes'], {'notas_frames': self.notas_frames, 'mx': float(self.mx)})
+        self.metricas.agregar('notes', frames=len(self.notas_frames))
+
+    def stats(self):
+        """Acumula la nota de mayor magnitud de cada frame y guarda notes.json."""
+        self.notes = NoteStats()
+        self.notes.update_many(self.notas_frames)
+        self.notas_dict = self.notes.snapshot()  #Ordenadas por número de veces contadas
+
+        #Guarda los datos en un archivo JSON
+        archivo_json = os.path.join(self._folder('record_data_folder'), 'notes.json')
+        with open(archivo_json, 'w') as f:
+            json.dump(self.notas_dict, f, indent=4)
+        self.metricas.agregar('stats', bytes_written=os.path.getsize(archivo_json))
+
+    def chords(self):
+        """Acordes de cada frame a partir del mismo espectro (por bloques si no hay matriz) y chords.json."""
+        if self.chromagram is None and self.magnitudes is None and self._en_cache('spectrum'):
+            self._espectro('chords')  #Notas de la caché: la matriz guardada evita otra pasada
+        if self.chromagram is not None:
+            chord = Chord.desde_chromagram(self.chromagram, self.config['fps'])
+        elif self.magnitudes is not None:
+            chord = Chord.desde_espectro(self.magnitudes, self.xf_espectro, self.config['fps'])
+        else:
+            chord = Chord.desde_espectro(self._bloques(), self.xf, self.config['fps'])
+        labels = chord.chords_by_frame(True, self.config['chord_penalty'], self.config['chord_min_score'])
+        self.acordes_frames = [chord.chord_names[i] if i < len(chord.chord_names) else None for i in labels]
+        self.acordes = chord.predict_chords(labels=labels)
+
+        archivo_json = os.path.join(self._folder('record_data_folder'), 'chords.json')
+        with open(archivo_json, 'w') as f:
+            json.dump(self.acordes, f, indent=4)
+        self.metricas.agregar('chords', frames=len(labels), segments=len(self.acordes))
+
+    def _render_pool(self, folder):
+        return RenderPool(self.xf_espectro, folder, self.config['render_workers'], self.config['resolution'],
+                          (self.config['freq_min'], self.config['freq_max']), self.config['render_scale'],
+                          backend=self.config['render_backend'])
+
+    def render(self):
+        """Renderiza los frames (en modo streaming se generan a medida que ffmpeg los consume)."""
+        #El video de la caché se copia ya aquí: si la entrada desaparece, se renderiza
+        if self.cache is not None:
+            self._video_en_cache = self.cache.restaurar_archivos(
+                self._claves['video'], {'graphs': self._folder('graphs_folder')}) is not None
+        if self._video_en_cache:
+            self.metricas.agregar('render', cached=True)
+            return
+
+        self._espectro('render')
+        acordes = None
+        if self.config['chord_overlay']:
+            if self.acordes_frames is None:
+                self.chords()
+            acordes = self.acordes_frames
+
+        #Frames que cambian visiblemente (el resto repite la imagen anterior)
+        indices = None
+        if self.config['skip_tolerance'] is not None:
+            indices = frames_con_cambios(self.xf_espectro, self.magnitudes, self.notas_frames, self.config['skip_tolerance'],
+                                         (self.config['freq_min'], self.config['freq_max']), acordes)
+            repeticiones = np.diff(np.append(indices, len(self.notas_frames)))
+            self._duraciones = dict(zip(indices.tolist(), repeticiones.tolist()))
+            self.metricas.agregar('render', frames_rendered=len(indices),
+                                  frames_skipped=len(self.notas_frames) - len(indices))
+
+        if self.config['stream_video']:
+            #El tiempo de renderizado queda incluido en la etapa "encode"
+            self.render_pool = self._render_pool(None)
+            if indices is None:
+                self._frames = ((imagen, 1) for imagen in
+                                self.render_pool.frames(self.magnitudes, self.notas_frames, acordes))
+            else:
+                self._frames = self.render_pool.frames_unicos(self.magnitudes, self.notas_frames, indices, acordes)
+            self.metricas.agregar('render', streamed=True)
+            return
+
+        #Elimina archivos PNG existentes en la carpeta "frames"
+        frame_folder = self._folder('frame_folder')
+        for filename in os.listdir(frame_folder):
+            if filename.endswith(".png"):
+                os.remove(os.path.join(frame_folder, filename))
+
+        self.render_pool = self._render_pool(frame_folder)
+        self.render_pool.render(self.magnitudes, self.notas_frames, acordes, indices)
+
+        bytes_written = sum(entry.stat().st_size for entry in os.scandir(frame_folder) if entry.name.endswith(".png"))
+        self.metricas.agregar('render', frames=len(self.notas_frames), bytes_written=bytes_written)
+
+    def encode(self):
+        """Genera el video con ffmpeg."""
+        ruta_salida = os.path.abspath(os.path.join(self._folder('graphs_folder'), 'frequency.mp4'))
+
+        if self._video_en_cache:
+            self.video_result = VideoResult(0, b'', b'')
+            self.metricas.agregar('encode', cached=True)
+        elif self.config['stream_video']:
+            #Si falla el renderizado o ffmpeg, se detienen ffmpeg, su hilo de escritura y el pool
+            try:
+                with VideoStream(ruta_salida, self.audio_file, self.config['fps'], self.config['resolution'],
+                                 input_format=self.render_pool.frame_format) as video:
+                    for imagen, repeticiones in self._frames:
+                        video.write(imagen, repeticiones)
+            finally:
+                self._frames.close()
+            self.video_result = video.close()
+            self.metricas.agregar('encode', frames=video.frames, bytes_piped=video.bytes_written,
+                                  includes_render=True)
+        else:
+            self.video_result = generar_video(self.config['frame_folder'], self.audio_file, ruta_salida,
+                                              self.config['fps'], self.config['resolution'], self._duraciones)
+
+        if os.path.exists(ruta_salida):
+            self.metricas.agregar('encode', bytes_written=os.path.getsize(ruta_salida))
+        self.metricas.agregar('encode', returncode=self.video_result.returncode)
+        if self.cache is not None and not self._video_en_cache and self.video_result.returncode == 0:
+            self.cache.guardar_archivos(self._claves['video'], {ruta_salida: 'graphs'})
+        return self.video_result
+
+    def vocal_range(self):
+        """Gráficas y JSON del rango vocal."""
+        graphs_folder = self._folder('graphs_folder')
+        record_data_folder = self._folder('record_data_folder')
+        archivo_json = os.path.join(record_data_folder, 'vocal_range.json')
+
+        restaurados = None
+        if self.cache is not None:
+            restaurados = self.cache.restaurar_archivos(self._claves['vocal_range'],
+                                                        {'graphs': graphs_folder, 'record_data': record_data_folder})
+        if restaurados is not None:
+            with open(archivo_json) as f:
+                self.rango = next(iter(json.load(f)))
+            self.metricas.agregar('vocal_range', cached=True)
+            return
+
+        rango_vocal_activacion = RangoVocal(self.notas_dict, graphs_folder, record_data_folder)
+        self.rango = rango_vocal_activacion.generar_campanas(self.config['vocal_plots'])
+        if self.cache is not None:
+            archivos = {archivo_json: 'record_data'}
+            if self.config['vocal_plots']:
+                archivos[os.path.join(graphs_folder, 'vocal_ranges.png')] = 'graphs'
+                archivos[os.path.join(graphs_folder, f'{self.rango}.png')] = 'graphs'
+            self.cache.guardar_archivos(self._claves['vocal_range'], archivos)
+
+    def tonality(self):
+        """Tonalidades más probables a partir de las notas contadas."""
+        record_data_folder = self._folder('record_data_folder')
+        prediccion = PrediccionTonalidad(self.notes, record_data_folder)
+        self.tonalidades = prediccion.predecir_tonalidad(self.config['key_method'])
+
+        #Tonalidad por ventanas, para grabaciones largas que cambian de tonalidad
+        ventana = self.config['key_window_seconds']
+        if ventana:
+            self.seguimiento_tonalidad = seguir_tonalidad(self.notas_frames, self.config['fps'], ventana,
+                                                          ventana / 4, self.config['key_tracking_method'])
+            with open(os.path.join(record_data_folder, 'key_tracking.json'), 'w') as f:
+                json.dump(self.seguimiento_tonalidad, f, indent=4)
+
+    def run(self, stages=STAGES):
+        """Ejecuta las etapas indicadas en orden, midiendo cada una.
+
+        El profiler se reanuda en cada llamada y el perfil guardado al terminar incluye
+        todas las llamadas anteriores de este Pipeline.
+        """
+        acciones = {
+            'load': self.load,
+            'stft': self.stft,
+            'notes': self.detect_notes,
+            'stats': self.stats,
+            'chords': self.chords,
+            'render': self.render,
+            'encode': self.encode,
+            'vocal_range': self.vocal_range,
+            'tonality': self.tonality,
+        }
+        self._etapas = set(stages)
+        self.metricas.iniciar_profiler()
+        try:
+            for stage in stages:
+                with self.metricas.etapa(stage):
+                    acciones[stage]()
+        finally:
+            record_data_folder = self._folder('record_data_folder')
+            self.metricas.detener_profiler(record_data_folder)
+            if self.config['metrics']:
+                self.metricas.guardar(os.path.join(record_data_folder, 'metrics.json'))
+        return self
@@ -0,0 +1,617 @@
+"""Servicio local de análisis: cola de trabajos sobre HTTP (TCP o socket Unix) con asyncio.
+
+Uso:
+    python service.py --port 8765
+    python service.py --unix /tmp/audio.sock
+
+    curl --data-binary @records/record.wav -H 'Content-Type: audio/wav' localhost:8765/jobs
+    curl -H 'Content-Type: application/json' -d '{"path": "records/record.wav", "video": false}' localhost:8765/jobs
+    curl localhost:8765/jobs/<id>
+    curl -N localhost:8765/jobs/<id>/events
+    curl localhost:8765/jobs/<id>/notes.json
+
+El análisis (STFT, notas, rango vocal y tonalidad) se ejecuta en un pool de procesos y
+el renderizado y la codificación del video en otro más pequeño. Cada etapa tiene un
+número fijo de consumidores y una cola acotada: si la cola de video está llena, el
+análisis espera, y si la cola de entrada está llena, las nuevas peticiones reciben 503.
+Las rutas de las peticiones JSON deben estar dentro de la carpeta desde la que se inicia
+el servicio (--raiz para elegir otra, --cualquier-ruta para aceptar cualquier archivo).
+Los trabajos terminados (y su carpeta) se eliminan al pasar el tiempo de retención o
+cuando hay más de los que se conservan.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from pipeline import DEFAULT_CONFIG, Pipeline
+
+#Etapas de cada pool
+ETAPAS_ANALISIS = ['load', 'stft', 'notes', 'stats', 'vocal_range', 'tonality']
+ETAPAS_VIDEO = ['load', 'stft', 'notes', 'render', 'encode']
+
+#Archivos que deja cada etapa (carpeta de configuración y nombre)
+RESULTADOS_ETAPA = {
+    'stats': [('record_data_folder', 'notes.json')],
+    'vocal_range': [('record_data_folder', 'vocal_range.json')],
+    'tonality': [('record_data_folder', 'tonalities.json'), ('record_data_folder', 'key_tracking.json')],
+    'encode': [('graphs_folder', 'frequency.mp4')],
+}
+
+#Parámetros que no se pueden cambiar desde una petición
+CLAVES_PROTEGIDAS = {'frame_folder', 'graphs_folder', 'record_data_folder', 'cache_folder', 'cache_max_bytes',
+                     'render_workers', 'profiler'}
+
+#Tipo de los parámetros cuyo valor por defecto no lo indica (None) o que admiten decimales
+TIPOS_CONFIG = {'skip_tolerance': float, 'key_window_seconds': float, 'freq_min': float, 'freq_max': float}
+OPCIONALES = {'skip_tolerance', 'key_window_seconds'}  #Parámetros que admiten None
+
+TIPOS_WAV = {'audio/wav', 'audio/x-wav', 'audio/wave', 'application/octet-stream'}
+TIPOS_CONTENIDO = {'.json': 'application/json', '.mp4': 'video/mp4'}
+ESTADOS_HTTP = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                409: 'Conflict', 411: 'Length Required', 413: 'Payload Too Large',
+                431: 'Request Header Fields Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+BLOQUE = 1 << 16
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje, cabeceras=None):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.cabeceras = cabeceras or {}
+
+
+#Procesos de los pools: cada etapa terminada se notifica por una cola compartida
+_eventos = None
+
+
+def _init_worker(eventos):
+    global _eventos
+    _eventos = eventos
+
+
+def _ejecutar(trabajo, fase, audio_file, config, etapas):
+    """Ejecuta las etapas de un trabajo en un proceso del pool, notificando cada una al terminar."""
+    pipeline = Pipeline(audio_file, config)
+    for etapa in etapas:
+        pipeline.run([etapa])
+        if etapa == 'encode' and pipeline.video_result.returncode != 0:
+            raise RuntimeError(pipeline.video_result.stderr.decode(errors='replace')[-2000:])
+        _eventos.put((trabajo, fase, etapa))
+    return {
+        'duration': pipeline.spectrogram.audio_length,
+        'frames': pipeline.spectrogram.frame_count,
+        'vocal_range': pipeline.rango,
+        'keys': pipeline.tonalidades,
+    }
+
+
+class Trabajo:
+    """Estado de un trabajo: fase, etapas terminadas, archivos disponibles y eventos para /events."""
+
+    def __init__(self, id, audio_file, folder, config, video):
+        self.id = id
+        self.audio_file = audio_file
+        self.folder = folder
+        self.config = config
+        self.video = video
+        self.estado = 'queued'  #queued, analysing, waiting_video, encoding, done, error
+        self.etapas = {}  #Etapas terminadas de cada fase (analysis, video)
+        self.archivos = {}  #Nombre -> ruta de los resultados ya escritos
+        self.resultado = {}
+        self.error = None
+        self.video_error = None
+        self.creado = time.time()
+        self.terminado_en = None
+        self.tiempos = {}
+        self.eventos = []
+        self.cambio = asyncio.Condition()
+
+    @property
+    def terminado(self):
+        return self.estado in ('done', 'error')
+
+    def resumen(self):
+        return {
+            'id': self.id,
+            'status': self.estado,
+            'stages': self.etapas,
+            'files': sorted(self.archivos),
+            'video': self.video,
+            'result': self.resultado,
+            'error': self.error,
+            'video_error': self.video_error,
+            'created': self.creado,
+            'seconds': self.tiempos,
+        }
+
+    async def emitir(self, evento):
+        self.eventos.append(evento)
+        async with self.cambio:
+            self.cambio.notify_all()
+
+
+class ServicioAnalisis:
+    """Cola de trabajos con un pool de procesos para el análisis y otro para el video.
+
+    cola limita los trabajos pendientes de análisis y cola_video los que esperan a
+    codificarse. Hay tantos consumidores de cada cola como procesos tiene su pool, de modo
+    que nunca se envían al pool más trabajos de los que puede ejecutar a la vez.
+    """
+
+    def __init__(self, folder='service', config=None, workers=None, video_workers=1, cola=16, cola_video=4,
+                 max_subida=512 * 1024 ** 2, video=True, raiz='.', retencion=3600, max_terminados=100):
+        self.folder = os.path.abspath(folder)
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        if self.config['cache_folder']:
+            self.config['cache_folder'] = os.path.abspath(self.config['cache_folder'])
+        self.workers = workers or os.cpu_count()
+        self.video_workers = video_workers
+        self.max_subida = max_subida
+        self.video = video  #Valor por defecto de cada trabajo
+        self.raiz = os.path.realpath(raiz) if raiz is not None else None  #Rutas aceptadas (None: cualquiera)
+        self.retencion = retencion  #Segundos que se conserva un trabajo terminado (None: sin límite)
+        self.max_terminados = max_terminados  #Trabajos terminados que se conservan (None: sin límite)
+
+        self.trabajos = {}
+        self.cola = asyncio.Queue(cola)
+        self.cola_video = asyncio.Queue(cola_video)
+        self._tareas = []
+        self._pools = {}
+        self._eventos = None
+        self._lector = None
+        self._loop = None
+
+    #Ciclo de vida
+    async def iniciar(self):
+        self._loop = asyncio.get_running_loop()
+        os.makedirs(os.path.join(self.folder, 'jobs'), exist_ok=True)
+
+        #spawn: los procesos no heredan los hilos ni el bucle de eventos del servicio
+        contexto = multiprocessing.get_context('spawn')
+        self._eventos = contexto.SimpleQueue()
+        for nombre, workers in (('analysis', self.workers), ('video', self.video_workers)):
+            self._pools[nombre] = ProcessPoolExecutor(workers, mp_context=contexto, initializer=_init_worker,
+                                                      initargs=(self._eventos,))
+        self._lector = threading.Thread(target=self._leer_eventos, daemon=True)
+        self._lector.start()
+
+        self._tareas = ([asyncio.create_task(self._consumir_analisis()) for _ in range(self.workers)] +
+                        [asyncio.create_task(self._consumir_video()) for _ in range(self.video_workers)] +
+                        [asyncio.create_task(self._podar_periodicamente())])
+
+    async def detener(self):
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        for pool in self._pools.values():
+            pool.shutdown(cancel_futures=True)
+        self._eventos.put(None)
+        self._lector.join()
+
+    def _leer_eventos(self):
+        #Hilo que pasa al bucle de eventos las etapas que terminan en los procesos
+        while True:
+            evento = self._eventos.get()
+            if evento is None:
+                break
+            asyncio.run_coroutine_threadsafe(self._etapa_terminada(*evento), self._loop)
+
+    async def _etapa_terminada(self, id, fase, etapa):
+        trabajo = self.trabajos.get(id)
+        if trabajo is None:
+            return
+        trabajo.etapas.setdefault(fase, []).append(etapa)
+        await trabajo.emitir({'event': 'stage', 'phase': fase, 'stage': etapa})
+        for clave, nombre in RESULTADOS_ETAPA.get(etapa, []):
+            ruta = os.path.join(trabajo.config[clave], nombre)
+            if not os.path.exists(ruta):
+                continue
+            trabajo.archivos[nombre] = ruta
+            evento = {'event': 'result', 'file': nombre}
+            if nombre.endswith('.json'):
+                with open(ruta) as f:
+                    evento['data'] = json.load(f)
+            await trabajo.emitir(evento)
+
+    async def _estado(self, trabajo, estado, **datos):
+        trabajo.estado = estado
+        if trabajo.terminado:
+            trabajo.terminado_en = time.time()
+        await trabajo.emitir(dict({'event': 'status', 'status': estado}, **datos))
+        if trabajo.terminado:
+            self.podar()
+
+    #Retención de los trabajos terminados
+    def podar(self, ahora=None):
+        """Elimina los trabajos terminados más antiguos que retencion y los que exceden max_terminados."""
+        terminados = sorted((t for t in self.trabajos.values() if t.terminado), key=lambda t: t.terminado_en)
+        sobran = len(terminados) - self.max_terminados if self.max_terminados is not None else 0
+        limite = (ahora or time.time()) - self.retencion if self.retencion is not None else None
+        for i, trabajo in enumerate(terminados):
+            if i < sobran or (limite is not None and trabajo.terminado_en < limite):
+                self.eliminar(trabajo.id)
+
+    async def _podar_periodicamente(self):
+        while True:
+            await asyncio.sleep(min(self.retencion, 60) if self.retencion is not None else 60)
+            self.podar()
+
+    #Consumidores de cada etapa
+    async def _ejecutar(self, fase, trabajo, etapas):
+        loop = asyncio.get_running_loop()
+        resultado = await loop.run_in_executor(self._pools[fase], _ejecutar, trabajo.id, fase, trabajo.audio_file,
+                                               trabajo.config, etapas)
+        #Los eventos de las etapas llegan por otra cola: se espera a que estén todos antes de seguir
+        async with trabajo.cambio:
+            await trabajo.cambio.wait_for(lambda: len(trabajo.etapas.get(fase, [])) >= len(etapas))
+        return resultado
+
+    async def _consumir_analisis(self):
+        while True:
+            trabajo = await self.cola.get()
+            try:
+                await self._estado(trabajo, 'analysing')
+                inicio = time.perf_counter()
+                trabajo.resultado = await self._ejecutar('analysis', trabajo, ETAPAS_ANALISIS)
+                trabajo.tiempos['analysis'] = time.perf_counter() - inicio
+            except Exception as e:
+                trabajo.error = f"{type(e).__name__}: {e}"
+                await self._estado(trabajo, 'error', error=trabajo.error)
+                continue
+            finally:
+                self.cola.task_done()
+
+            if trabajo.video:
+                #Si la cola de video está llena, este consumidor espera (y la cola de entrada se llena)
+                await self._estado(trabajo, 'waiting_video')
+                await self.cola_video.put(trabajo)
+            else:
+                await self._estado(trabajo, 'done', result=trabajo.resultado)
+
+    async def _consumir_video(self):
+        while True:
+            trabajo = await self.cola_video.get()
+            try:
+                await self._estado(trabajo, 'encoding')
+                inicio = time.perf_counter()
+                await self._ejecutar('video', trabajo, ETAPAS_VIDEO)
+                trabajo.tiempos['video'] = time.perf_counter() - inicio
+            except Exception as e:
+                #Los resultados del análisis siguen siendo válidos aunque falle el video
+                trabajo.video_error = f"{type(e).__name__}: {e}"
+            finally:
+                self.cola_video.task_done()
+            await self._estado(trabajo, 'done', result=trabajo.resultado, video_error=trabajo.video_error)
+
+    #Alta de trabajos
+    def _config_trabajo(self, folder, cambios):
+        if not isinstance(cambios, dict):
+            raise ErrorHTTP(400, "config debe ser un objeto JSON")
+        desconocidas = set(cambios) - set(DEFAULT_CONFIG)
+        protegidas = set(cambios) & CLAVES_PROTEGIDAS
+        if desconocidas or protegidas:
+            raise ErrorHTTP(400, f"Parámetros no permitidos: {sorted(desconocidas | protegidas)}")
+        invalidas = sorted(clave for clave, valor in cambios.items() if not self._tipo_valido(clave, valor))
+        if invalidas:
+            raise ErrorHTTP(400, f"Valores con tipo no válido: {invalidas}")
+        config = dict(self.config, **cambios)
+        if 'resolution' in cambios:
+            config['resolution'] = tuple(config['resolution'])
+        for clave, carpeta in (('record_data_folder', 'record_data'), ('graphs_folder', 'graphs'),
+                               ('frame_folder', 'frames')):
+            config[clave] = os.path.join(folder, carpeta)
+        return config
+
+    @staticmethod
+    def _tipo_valido(clave, valor):
+        """Comprueba que el valor tiene el tipo del parámetro en DEFAULT_CONFIG (los enteros valen como float)."""
+        if valor is None:
+            return clave in OPCIONALES
+        if clave == 'resolution':
+            return (isinstance(valor, (list, tuple)) and len(valor) == 2
+                    and all(isinstance(v, int) and not isinstance(v, bool) and v > 0 for v in valor))
+        tipo = TIPOS_CONFIG.get(clave, type(DEFAULT_CONFIG[clave]))
+        if tipo is bool:
+            return isinstance(valor, bool)
+        if isinstance(valor, bool):
+            return False
+        if tipo is float:
+            return isinstance(valor, (int, float))
+        return isinstance(valor, tipo)
+
+    def _comprobar_cola(self):
+        if self.cola.full():
+            raise ErrorHTTP(503, "La cola de trabajos está llena", {'Retry-After': '5'})
+
+    async def agregar(self, audio_file, cambios, video, folder=None, id=None):
+        """Encola un trabajo sobre un WAV ya en disco."""
+        id = id or uuid.uuid4().hex[:12]
+        folder = folder or os.path.join(self.folder, 'jobs', id)
+        os.makedirs(folder, exist_ok=True)
+        try:
+            trabajo = Trabajo(id, audio_file, folder, self._config_trabajo(folder, cambios),
+                              self.video if video is None else video)
+            self.cola.put_nowait(trabajo)
+        except (ErrorHTTP, asyncio.QueueFull):
+            shutil.rmtree(folder, ignore_errors=True)
+            self._comprobar_cola()
+            raise
+        self.trabajos[id] = trabajo
+        await trabajo.emitir({'event': 'status', 'status': 'queued'})
+        return trabajo
+
+    def eliminar(self, id):
+        trabajo = self.trabajo(id)
+        if not trabajo.terminado:
+            raise ErrorHTTP(409, "El trabajo no ha terminado")
+        del self.trabajos[id]
+        shutil.rmtree(trabajo.folder, ignore_errors=True)
+
+    def trabajo(self, id):
+        if id not in self.trabajos:
+            raise ErrorHTTP(404, f"Trabajo desconocido: {id}")
+        return self.trabajos[id]
+
+    def resumen(self):
+        estados = {}
+        for trabajo in self.trabajos.values():
+            estados[trabajo.estado] = estados.get(trabajo.estado, 0) + 1
+        return {
+            'queue': {'analysis': self.cola.qsize(), 'video': self.cola_video.qsize(),
+                      'analysis_max': self.cola.maxsize, 'video_max': self.cola_video.maxsize},
+            'workers': {'analysis': self.workers, 'video': self.video_workers},
+            'jobs': estados,
+        }
+
+    #HTTP
+    async def atender(self, reader, writer):
+        """Atiende una petición por conexión (Connection: close)."""
+        try:
+            try:
+                metodo, ruta, query, cabeceras = await self._leer_cabeceras(reader)
+                await self._despachar(metodo, ruta, query, cabeceras, reader, writer)
+            except ErrorHTTP as e:
+                await self._responder_json(writer, e.estado, {'error': str(e)}, e.cabeceras)
+            except Exception as e:
+                await self._responder_json(writer, 500, {'error': f"{type(e).__name__}: {e}"})
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _leer_cabeceras(self, reader):
+        try:
+            datos = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 30)
+        except asyncio.LimitOverrunError:
+            raise ErrorHTTP(431, "Cabeceras demasiado grandes")
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            raise ConnectionError
+        lineas = datos.decode('latin-1').split('\r\n')
+        try:
+            metodo, objetivo, _ = lineas[0].split(' ', 2)
+        except ValueError:
+            raise ErrorHTTP(400, "Petición mal formada")
+        cabeceras = {}
+        for linea in lineas[1:]:
+            if ':' in linea:
+                nombre, valor = linea.split(':', 1)
+                cabeceras[nombre.strip().lower()] = valor.strip()
+        partes = urlsplit(objetivo)
+        query = {clave: valores[-1] for clave, valores in parse_qs(partes.query).items()}
+        return metodo.upper(), [p for p in partes.path.split('/') if p], query, cabeceras
+
+    async def _despachar(self, metodo, ruta, query, cabeceras, reader, writer):
+        if ruta == ['jobs']:
+            if metodo == 'GET':
+                return await self._responder_json(writer, 200, dict(
+                    self.resumen(), items=[t.resumen() for t in self.trabajos.values()]))
+            if metodo == 'POST':
+                trabajo = await self._crear(query, cabeceras, reader, writer)
+                return await self._responder_json(writer, 202, trabajo.resumen(),
+                                                  {'Location': f'/jobs/{trabajo.id}'})
+            raise ErrorHTTP(405, "Método no permitido")
+
+        if len(ruta) >= 2 and ruta[0] == 'jobs':
+            trabajo = self.trabajo(ruta[1])
+            if len(ruta) == 2 and metodo == 'GET':
+                return await self._responder_json(writer, 200, trabajo.resumen())
+            if len(ruta) == 2 and metodo == 'DELETE':
+                self.eliminar(trabajo.id)
+                return await self._responder_json(writer, 200, {'deleted': trabajo.id})
+            if len(ruta) == 3 and metodo == 'GET':
+                if ruta[2] == 'events':
+                    return await self._transmitir_eventos(writer, trabajo)
+                return await self._enviar_archivo(writer, trabajo, ruta[2])
+            raise ErrorHTTP(405, "Método no permitido")
+
+        if ruta == ['health'] and metodo == 'GET':
+            return await self._responder_json(writer, 200, self.resumen())
+        raise ErrorHTTP(404, "Ruta desconocida")
+
+    async def _crear(self, query, cabeceras, reader, writer):
+        """Nuevo trabajo a partir de un WAV en el cuerpo o de un JSON con la ruta del archivo."""
+        if 'content-length' not in cabeceras:
+            raise ErrorHTTP(411, "Falta Content-Length")
+        longitud = int(cabeceras['content-length'])
+        tipo = cabeceras.get('content-type', 'application/octet-stream').split(';')[0].strip()
+
+        #Con "Expect: 100-continue" el cliente no envía el cuerpo hasta que se acepta la petición;
+        #sin él, el cuerpo se descarta antes de responder para que el cliente pueda leer el 503
+        continuar = cabeceras.get('expect', '').lower() == '100-continue'
+        if self.cola.full() and not continuar and longitud <= self.max_subida:
+            await self._descartar(reader, longitud)
+        self._comprobar_cola()
+
+        #curl -d sin cabecera envía el JSON como formulario
+        if tipo in ('application/json', 'application/x-www-form-urlencoded'):
+            if longitud > 1024 ** 2:
+                raise ErrorHTTP(413, "Cuerpo JSON demasiado grande")
+            try:
+                datos = json.loads(await reader.readexactly(longitud))
+            except (ValueError, asyncio.IncompleteReadError):
+                raise ErrorHTTP(400, "JSON no válido")
+            if not isinstance(datos, dict) or 'path' not in datos:
+                raise ErrorHTTP(400, "Se esperaba {\"path\": ...}")
+            return await self.agregar(self._ruta_permitida(datos['path']), datos.get('config', {}), datos.get('video'))
+
+        if tipo not in TIPOS_WAV:
+            raise ErrorHTTP(400, f"Tipo de contenido no soportado: {tipo}")
+        if longitud > self.max_subida:
+            raise ErrorHTTP(413, f"El archivo supera {self.max_subida} bytes")
+        if continuar:
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await writer.drain()
+
+        #Opciones de la subida en la query: ?video=0&pitch=bin&fps=24
+        video = query.pop('video', None)
+        cambios = {clave: self._valor(valor) for clave, valor in query.items()}
+        id = uuid.uuid4().hex[:12]
+        folder = os.path.join(self.folder, 'jobs', id)
+        os.makedirs(folder, exist_ok=True)
+        audio_file = os.path.join(folder, 'audio.wav')
+        try:
+            await self._recibir_archivo(reader, audio_file, longitud)
+            return await self.agregar(audio_file, cambios, None if video is None else video not in ('0', 'false'),
+                                      folder, id)
+        except BaseException:
+            shutil.rmtree(folder, ignore_errors=True)
+            raise
+
+    def _ruta_permitida(self, path):
+        """Ruta absoluta del WAV de una petición JSON, que debe existir y estar dentro de raiz."""
+        if not isinstance(path, str):
+            raise ErrorHTTP(400, "path debe ser una cadena")
+        audio_file = os.path.realpath(path)  #Sin enlaces simbólicos que salgan de raiz
+        if self.raiz is not None and os.path.commonpath([self.raiz, audio_file]) != self.raiz:
+            raise ErrorHTTP(400, f"Ruta fuera de {self.raiz}")
+        if not os.path.isfile(audio_file):
+            raise ErrorHTTP(400, f"No existe el archivo: {path}")
+        return audio_file
+
+    @staticmethod
+    def _valor(texto):
+        try:
+            return json.loads(texto)
+        except ValueError:
+            return texto
+
+    @staticmethod
+    async def _descartar(reader, longitud):
+        while longitud:
+            bloque = await reader.read(min(BLOQUE, longitud))
+            if not bloque:
+                break
+            longitud -= len(bloque)
+
+    async def _recibir_archivo(self, reader, ruta, longitud):
+        #Escribe la subida por bloques, sin tenerla entera en memoria
+        pendiente = longitud
+        with open(ruta, 'wb') as f:
+            while pendiente:
+                bloque = await reader.read(min(BLOQUE, pendiente))
+                if not bloque:
+                    raise ErrorHTTP(400, "Subida incompleta")
+                if f.tell() == 0 and not (bloque[:4] == b'RIFF' and bloque[8:12] == b'WAVE'):
+                    raise ErrorHTTP(400, "El archivo no es un WAV")
+                f.write(bloque)
+                pendiente -= len(bloque)
+
+    async def _responder(self, writer, estado, cuerpo, tipo, cabeceras=None):
+        lineas = [f"HTTP/1.1 {estado} {ESTADOS_HTTP[estado]}", f"Content-Type: {tipo}",
+                  f"Content-Length: {len(cuerpo)}", "Connection: close"]
+        lineas += [f"{nombre}: {valor}" for nombre, valor in (cabeceras or {}).items()]
+        writer.write(('\r\n'.join(lineas) + '\r\n\r\n').encode() + cuerpo)
+        await writer.drain()
+
+    async def _responder_json(self, writer, estado, datos, cabeceras=None):
+        await self._responder(writer, estado, json.dumps(datos, indent=4).encode(), 'application/json', cabeceras)
+
+    async def _enviar_archivo(self, writer, trabajo, nombre):
+        if nombre not in trabajo.archivos:
+            raise ErrorHTTP(404, f"{nombre} todavía no está disponible (estado: {trabajo.estado})")
+        ruta = trabajo.archivos[nombre]
+        tipo = TIPOS_CONTENIDO.get(os.path.splitext(nombre)[1], 'application/octet-stream')
+        writer.write((f"HTTP/1.1 200 OK\r\nContent-Type: {tipo}\r\nContent-Length: {os.path.getsize(ruta)}\r\n"
+                      f"Connection: close\r\n\r\n").encode())
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(BLOQUE), b''):
+                writer.write(bloque)
+                await writer.drain()  #Respeta la velocidad del cliente
+
+    async def _transmitir_eventos(self, writer, trabajo):
+        """Eventos del trabajo en JSON por líneas (chunked) hasta que termina."""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        enviados = 0
+        while True:
+            while enviados < len(trabajo.eventos):
+                linea = (json.dumps(trabajo.eventos[enviados]) + '\n').encode()
+                writer.write(f"{len(linea):x}\r\n".encode() + linea + b"\r\n")
+                await writer.drain()
+                enviados += 1
+            if trabajo.terminado:
+                break
+            async with trabajo.cambio:
+                await trabajo.cambio.wait_for(lambda: len(trabajo.eventos) > enviados)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def servir(servicio, host='127.0.0.1', port=8765, unix=None):
+    await servicio.iniciar()
+    #SIGTERM detiene el servidor igual que Ctrl+C, cerrando los pools
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    if unix:
+        servidor = await asyncio.start_unix_server(servicio.atender, unix)
+        print(f"Escuchando en {unix}")
+    else:
+        servidor = await asyncio.start_server(servicio.atender, host, port)
+        print(f"Escuchando en http://{host}:{port}")
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        await servicio.detener()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio local de análisis de audio")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', metavar='SOCKET', help="Escucha en un socket Unix en lugar de TCP")
+    parser.add_argument('--folder', default='service', help="Carpeta de los trabajos")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Procesos de análisis")
+    parser.add_argument('--video-workers', type=int, default=1, help="Procesos de video")
+    parser.add_argument('--render-workers', type=int, default=2, help="Procesos de renderizado por video")
+    parser.add_argument('--cola', type=int, default=16, help="Trabajos pendientes de análisis antes de responder 503")
+    parser.add_argument('--cola-video', type=int, default=4, help="Trabajos pendientes de video")
+    parser.add_argument('--max-subida', type=int, default=512, help="Tamaño máximo de una subida en MB")
+    parser.add_argument('--sin-video', action='store_true', help="Por defecto los trabajos no generan video")
+    parser.add_argument('--raiz', default='.', help="Solo acepta rutas dentro de esta carpeta (por defecto, la actual)")
+    parser.add_argument('--cualquier-ruta', action='store_true', help="Acepta rutas a cualquier archivo del equipo")
+    parser.add_argument('--retencion', type=float, default=3600,
+                        help="Segundos que se conservan los trabajos terminados (0: sin límite)")
+    parser.add_argument('--max-terminados', type=int, default=100,
+                        help="Trabajos terminados que se conservan (0: sin límite)")
+    args = parser.parse_args(argv)
+
+    servicio = ServicioAnalisis(args.folder, {'render_workers': args.render_workers}, args.workers,
+                                args.video_workers, args.cola, args.cola_video, args.max_subida * 1024 ** 2,
+                                not args.sin_video, None if args.cualquier_ruta else args.raiz, args.retencion or None, args.max_terminados or None)
+    try:
+        asyncio.run(servir(servicio, args.host, args.port, args.unix))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == '__main__':
+    main()
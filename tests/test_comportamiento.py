@@ -0,0 +1,201 @@
+"""Comportamiento de acordes, renderizado selectivo, caché y seguimiento de tonalidad."""
+import os
+
+import numpy as np
+import pytest
+
+import cache
+from cache import CacheResultados
+from Chord import Chord, ChromaFFT
+from pipeline import DEFAULT_CONFIG
+from Render import frames_con_cambios
+from tonality import seguir_tonalidad
+
+XF = np.fft.rfftfreq(2 * 1024, 1 / 8192)  #Bins de 4 Hz hasta 4096 Hz
+
+
+def magnitudes_aleatorias(seed, frames=300):
+    rng = np.random.default_rng(seed)
+    magnitudes = rng.random((frames, len(XF))) ** 8
+    magnitudes[::11] = 0  #Frames en silencio
+    return magnitudes
+
+
+def viterbi_original(scores, penalty):
+    #Viterbi frame a frame con la misma preferencia en los empates (seguir en el estado, el primero)
+    states, frames = scores.shape
+    delta = scores[:, 0].copy()
+    previo = np.zeros((states, frames), dtype=int)
+    for t in range(1, frames):
+        cambio = delta.max() - penalty
+        seguir = delta >= cambio
+        previo[:, t] = np.where(seguir, np.arange(states), delta.argmax())
+        delta = np.where(seguir, delta, cambio) + scores[:, t]
+    path = np.zeros(frames, dtype=int)
+    path[-1] = delta.argmax()
+    for t in range(frames - 1, 0, -1):
+        path[t - 1] = previo[path[t], t]
+    return path
+
+
+def puntuacion(scores, path, penalty):
+    return scores[path, np.arange(len(path))].sum() - penalty * np.count_nonzero(np.diff(path))
+
+
+#Acordes
+def test_chroma_normaliza_cada_frame():
+    magnitudes = magnitudes_aleatorias(0)
+    chroma = ChromaFFT(XF).chroma(magnitudes)
+    assert chroma.shape == (12, len(magnitudes))
+    assert np.allclose(chroma[:, 1::11].max(axis=0), 1) and not chroma[:, ::11].any()
+
+    #Un pico en 440 Hz solo suma a la clase de La; fuera de la banda no cuenta
+    pico = np.zeros((2, len(XF)))
+    pico[0, np.argmin(np.abs(XF - 440))] = 1
+    pico[1, np.argmin(np.abs(XF - 3000))] = 1
+    chroma = ChromaFFT(XF).chroma(pico)
+    assert chroma[:, 0].tolist() == [0] * 9 + [1, 0, 0]
+    assert not chroma[:, 1].any()
+
+
+def test_chroma_por_bloques_igual_que_completo():
+    magnitudes = magnitudes_aleatorias(1)
+    croma = ChromaFFT(XF)
+    completo = croma.chroma(magnitudes)
+    por_bloques = np.hstack([croma.chroma(magnitudes[i:i + 37]) for i in range(0, len(magnitudes), 37)])
+    assert np.allclose(por_bloques, completo)
+
+
+def test_desde_espectro_matriz_o_bloques():
+    magnitudes = magnitudes_aleatorias(2)
+    esperado = ChromaFFT(XF).chroma(magnitudes)
+    bloques = [magnitudes[:1], magnitudes[1:100], magnitudes[100:]]
+    for chord in (Chord.desde_espectro(magnitudes, XF, 30), Chord.desde_espectro(magnitudes, XF, 30, block_frames=7),
+                  Chord.desde_espectro(bloques, XF, 30), Chord.desde_espectro(iter(bloques), XF, 30)):
+        assert np.allclose(chord.chromagram, esperado)
+        assert chord.frame_seconds == 1 / 30
+    assert Chord.desde_espectro([], XF, 30).chromagram.shape == (12, 0)
+
+    #Un acorde de Do mayor (C4, E4, G4) en todos los frames
+    acorde = np.zeros((20, len(XF)))
+    acorde[:, [np.argmin(np.abs(XF - f)) for f in (261.63, 329.63, 392.0)]] = 1
+    chord = Chord.desde_espectro(acorde, XF, 30)
+    assert chord.predict_chords()[0]['chord'] == 'C' and len(chord.predict_chords()) == 1
+
+
+@pytest.mark.parametrize('window', [1, 3, 128, 1000])
+@pytest.mark.parametrize('penalty', [0.0, 0.3, 2.0])
+def test_viterbi_por_ventanas_igual_que_frame_a_frame(window, penalty):
+    rng = np.random.default_rng(window)
+    scores = rng.random((25, 400))
+    scores[:, 100:180] += 0.5 * (np.arange(25) == 3)[:, None]  #Un acorde estable
+    esperado = viterbi_original(scores, penalty)
+    assert Chord.viterbi(scores, penalty, window).tolist() == esperado.tolist()
+
+
+@pytest.mark.parametrize('window', [1, 5, 128])
+def test_viterbi_empates(window):
+    #Con puntuaciones enteras hay muchos caminos óptimos: el resultado debe ser uno de ellos
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 3, (6, 200)).astype(float)
+    path = Chord.viterbi(scores, 1.0, window)
+    optimo = viterbi_original(scores, 1.0)
+    assert puntuacion(scores, path, 1.0) == puntuacion(scores, optimo, 1.0)
+    assert Chord.viterbi(np.zeros((4, 0)), 1.0, window).tolist() == []
+    assert Chord.viterbi(np.ones((4, 1)), 1.0, window).tolist() == [0]
+
+
+#Renderizado selectivo
+def test_frames_con_cambios():
+    magnitudes = np.zeros((6, len(XF)))
+    notas = [[] for _ in magnitudes]
+    assert frames_con_cambios(XF, magnitudes, notas, 0.01).tolist() == [0]
+    assert frames_con_cambios(XF, magnitudes[:0], notas[:0], 0.01).tolist() == []
+
+    #Los cambios fuera de la banda visible no cuentan; los de dentro, según la tolerancia
+    magnitudes[1, np.argmin(np.abs(XF - 2000))] = 1
+    magnitudes[3:, np.argmin(np.abs(XF - 440))] = 0.05
+    assert frames_con_cambios(XF, magnitudes, notas, 0.01).tolist() == [0, 3]
+    assert frames_con_cambios(XF, magnitudes, notas, 0.1).tolist() == [0]
+
+    #Cambio de notas y de acorde
+    notas[4] = [[440.0, 'A4', 0.05]]
+    notas[5] = [[440.0, 'A4', 0.05]]
+    assert frames_con_cambios(XF, magnitudes, notas, 0.1).tolist() == [0, 4]
+    assert frames_con_cambios(XF, magnitudes, notas, 0.1, acordes=[0, 0, 1, 1, 1, 1]).tolist() == [0, 2, 4]
+
+
+def test_frames_con_cambios_etiquetas_en_unidades_del_eje():
+    #Una etiqueta que se mueve 20 Hz es el 2 % del eje de 50-1100 Hz
+    magnitudes = np.zeros((2, len(XF)))
+    notas = [[[440.0, 'A4', 0.5]], [[460.0, 'A4', 0.5]]]
+    assert frames_con_cambios(XF, magnitudes, notas, 0.03).tolist() == [0]
+    assert frames_con_cambios(XF, magnitudes, notas, 0.01).tolist() == [0, 1]
+    notas[1] = [[440.0, 'A4', 0.52]]
+    assert frames_con_cambios(XF, magnitudes, notas, 0.03).tolist() == [0]
+    assert frames_con_cambios(XF, magnitudes, notas, 0.01).tolist() == [0, 1]
+
+
+#Caché
+def test_claves_solo_cambian_las_etapas_dependientes(tmp_path):
+    resultados = CacheResultados(str(tmp_path))
+    config = dict(DEFAULT_CONFIG)
+    base = resultados.claves('audio', config)
+    assert len(set(base.values())) == len(base)
+    assert not set(resultados.claves('otro', config).values()) & set(base.values())
+
+    for clave, valor, cambian in [('fps', 24, {'spectrum', 'notes', 'video', 'vocal_range'}),
+                                  ('floor', 0.1, {'notes', 'video', 'vocal_range'}),
+                                  ('resolution', (640, 360), {'video'}),
+                                  ('vocal_plots', False, {'vocal_range'}),
+                                  ('render_workers', 64, set())]:
+        claves = resultados.claves('audio', dict(config, **{clave: valor}))
+        assert {etapa for etapa in base if claves[etapa] != base[etapa]} == cambian, clave
+
+
+def test_claves_cambian_con_el_codigo(tmp_path, monkeypatch):
+    resultados = CacheResultados(str(tmp_path))
+    base = resultados.claves('audio', DEFAULT_CONFIG)
+    monkeypatch.setitem(cache.MODULOS_ETAPA, 'notes', ['Notes.py', 'Vocal.py'])
+    claves = resultados.claves('audio', DEFAULT_CONFIG)
+    assert {etapa for etapa in base if claves[etapa] != base[etapa]} == {'notes', 'video', 'vocal_range'}
+
+
+def test_cache_elimina_las_entradas_menos_usadas(tmp_path):
+    resultados = CacheResultados(str(tmp_path))
+    datos = {'notas': list(range(300))}
+    for i, clave in enumerate('abc'):
+        resultados.guardar_json(clave, datos)
+        os.utime(tmp_path / clave, (i, i))
+    resultados.guardar_espectro('espectro', np.ones((4, 8)), 2.0)
+    magnitudes, mx = resultados.cargar_espectro('espectro')
+    assert magnitudes.dtype == np.float32 and magnitudes.shape == (4, 8) and mx == 2.0
+    os.utime(tmp_path / 'espectro', (0, 0))
+
+    #Leer "a" la marca como usada: sobran dos entradas y se eliminan "espectro" y "b"
+    assert resultados.cargar_json('a') == datos
+    resultados.max_bytes = 2 * os.path.getsize(tmp_path / 'a' / 'data.json')
+    resultados.limpiar()
+    assert [resultados.contiene(clave) for clave in ('a', 'b', 'c', 'espectro')] == [True, False, True, False]
+    assert resultados.cargar_json('b') is None and resultados.cargar_espectro('espectro') is None
+
+    resultados.max_bytes = 0
+    resultados.limpiar()
+    assert os.listdir(tmp_path) == [] and resultados.cargar_json('a') is None
+
+
+#Tonalidad a lo largo del tiempo
+def test_seguir_tonalidad():
+    la = [[110.0, 'A2', 1.0]]
+    assert seguir_tonalidad([la] * 60, 30, 1, 1) == [{'key': 'A Major', 'start': 0.0, 'end': 2.0}]
+    #Con "escalas" una sola nota empata en varias tonalidades
+    assert seguir_tonalidad([la] * 60, 30, 1, 1, 'escalas') == [{'key': None, 'start': 0.0, 'end': 2.0}]
+    assert seguir_tonalidad([[]] * 30, 30, 1, 1) == [{'key': None, 'start': 0.0, 'end': 1.0}]
+    assert seguir_tonalidad([], 30) == []
+
+    #Do mayor y después silencio: el silencio no hereda la tonalidad anterior
+    do_mayor = [[[261.63 * 2 ** (i / 12), nombre, 1.0]] for i, nombre in
+                zip([0, 2, 4, 5, 7, 9, 11, 0, 4, 7], ['C4', 'D4', 'E4', 'F4', 'G4', 'A4', 'B4', 'C4', 'E4', 'G4'])]
+    segmentos = seguir_tonalidad(do_mayor * 3 + [[]] * 30, 30, 1, 1)
+    assert [s['key'] for s in segmentos] == ['C Major', None]
+    assert segmentos[0]['end'] == segmentos[1]['start'] == 1.0
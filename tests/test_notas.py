@@ -0,0 +1,38 @@
+"""Detección de notas en señales sintéticas."""
+import numpy as np
+import pytest
+
+from Notes import NoteDetector
+from Spectrum import Spectrogram
+
+FS = 22050
+
+
+def espectro_tonos(frecuencias, armonicos=1, segundos=2):
+    t = np.arange(FS * segundos) / FS
+    audio = sum(np.sin(2 * np.pi * f * h * t) / h for f in frecuencias for h in range(1, armonicos + 1))
+    spectrogram = Spectrogram(audio * 8000, FS)
+    return spectrogram.compute()[0], spectrogram.xf
+
+
+#Tonos puros: el espectro armónico es casi nulo y se usan los picos del espectro
+@pytest.mark.parametrize('frecuencias, notas', [([440], {'A4'}), ([100], {'G2'}),
+                                                ([261.63, 329.63, 392.0], {'C4', 'E4', 'G4'})])
+def test_hps_detecta_tonos_puros(frecuencias, notas):
+    magnitudes, xf = espectro_tonos(frecuencias)
+    for pitch in ('bin', 'hps'):
+        found = NoteDetector(xf, pitch=pitch).detect(magnitudes, 5)
+        centro = found[len(found) // 4:3 * len(found) // 4]
+        assert all(notas <= {nombre for _, nombre, _ in frame} for frame in centro)
+        if pitch == 'hps':
+            for frame in centro:
+                for frecuencia, nombre, _ in frame[:len(notas)]:
+                    assert min(abs(frecuencia - f) for f in frecuencias) < 1  #Interpolación parabólica
+
+
+def test_hps_prefiere_la_fundamental():
+    #Con armónicos el segundo armónico (A3) domina 'bin' pero no 'hps'
+    magnitudes, xf = espectro_tonos([110], armonicos=4)
+    magnitudes[:, np.abs(xf - 110) < 3] *= 0.3
+    found = NoteDetector(xf, pitch='hps').detect(magnitudes, 1)
+    assert all(frame[0][1] == 'A2' for frame in found[len(found) // 4:3 * len(found) // 4])
@@ -0,0 +1,180 @@
+"""Comparación de las versiones vectorizadas con los bucles originales.
+
+Cada función *_original reproduce el código anterior (main.py, Vocal.py y tonality.py de la
+versión inicial) sin gráficas ni archivos, para comprobar que los resultados no cambian.
+"""
+import glob
+import os
+from collections import defaultdict
+
+import numpy as np
+import pytest
+from scipy.io import wavfile
+
+from Notes import NoteDetector, NoteStats, freq_to_number, note_name
+from Spectrum import Spectrogram
+from Vocal import RangoVocal
+from tonality import NOTAS, PrediccionTonalidad
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIOS = sorted(glob.glob(os.path.join(RAIZ, 'guitar_dataset', '*', '*-1-*.wav')))[::12]
+AUDIOS += [os.path.join(RAIZ, 'records', 'record.wav')]
+
+
+def find_top_notes_original(fft, xf, num):
+    #find_top_notes de main.py, sin el diccionario global de estadísticas
+    if np.max(fft.real) < 0.001:
+        return []
+
+    lst = sorted(enumerate(fft.real), key=lambda x: x[1], reverse=True)
+    idx = 0
+    found = []
+    found_note = set()
+    while (idx < len(lst)) and (len(found) < num):
+        f = xf[lst[idx][0]]
+        y = lst[idx][1]
+        n = freq_to_number(f)
+        if n == float('inf') or y < 0.05:
+            idx += 1
+            continue
+        name = note_name(int(round(n)))
+        if y > 0.6 or name not in found_note:
+            found_note.add(name)
+            found.append([f, name, y])
+        idx += 1
+    return found
+
+
+def estadisticas_original(found_frames):
+    #Diccionario de notes.json que construían find_top_notes y save_data
+    notes = defaultdict(lambda: {'count': 0, 'magnitude': 0, 'frequency': 0})
+    for found in found_frames:
+        max_magnitude_note = None
+        for s in found:
+            if max_magnitude_note is None or s[2] > max_magnitude_note[2]:
+                max_magnitude_note = s
+        if max_magnitude_note:
+            freq, name, mag = max_magnitude_note
+            notes[name]['count'] += 1
+            notes[name]['magnitude'] = max(notes[name]['magnitude'], mag)
+            notes[name]['frequency'] = freq
+    return dict(sorted(notes.items(), key=lambda x: x[1]['count'], reverse=True))
+
+
+def clasificar_original(rangos, data, frecuencia_minima=50, frecuencia_maxima=1100, distancia_minima=10):
+    #Conteo por rango y filtro de frecuencias de RangoVocal.generar_campanas
+    conteo_notas = {rango: 0 for rango in rangos}
+    for rango, (min_f, max_f) in rangos.items():
+        for info in data.values():
+            freq = info['frequency']
+            if min_f <= freq <= max_f and frecuencia_minima <= freq <= frecuencia_maxima:
+                conteo_notas[rango] += 1
+
+    filtered_frequencies = []
+    for info in data.values():
+        freq = info['frequency']
+        if frecuencia_minima <= freq <= frecuencia_maxima and any(
+                min_f <= freq <= max_f for min_f, max_f in rangos.values()):
+            if all(abs(freq - f) >= distancia_minima for f in filtered_frequencies):
+                filtered_frequencies.append(freq)
+    return max(conteo_notas, key=conteo_notas.get), conteo_notas, filtered_frequencies
+
+
+def tonalidad_original(notas_grabadas, escalas):
+    #PrediccionTonalidad.predecir_tonalidad: todas las escalas empatadas con la mejor puntuación
+    mejor_puntaje = -1
+    escalas_detectadas = []
+    for tonalidad, escala in escalas.items():
+        puntaje = sum(notas_grabadas[nota] for nota in notas_grabadas if nota in escala)
+        if puntaje > mejor_puntaje:
+            mejor_puntaje = puntaje
+            escalas_detectadas = [tonalidad]
+        elif puntaje == mejor_puntaje:
+            escalas_detectadas.append(tonalidad)
+    return escalas_detectadas
+
+
+def espectro(audio_file):
+    fs, data = wavfile.read(audio_file)
+    audio = data.T[0] if data.ndim > 1 else data
+    spectrogram = Spectrogram(audio.astype(float), fs)
+    return spectrogram.compute()[0], spectrogram.xf
+
+
+def espectro_aleatorio(seed, frames=200, bins=2757, picos=12):
+    #Pocos picos por frame con valores en los límites de floor y threshold, y muchos empates
+    rng = np.random.default_rng(seed)
+    magnitudes = np.zeros((frames, bins))
+    columnas = rng.integers(0, bins // 2, (frames, picos))
+    valores = rng.choice([0.04, 0.05, 0.051, 0.3, 0.6, 0.61, 1.0], (frames, picos))
+    magnitudes[np.arange(frames)[:, None], columnas] = valores
+    magnitudes[::7] *= 0.0009  #Frames en silencio
+    return magnitudes, np.fft.rfftfreq(2 * (bins - 1), 1 / 22050)
+
+
+@pytest.fixture(scope='module')
+def espectros():
+    return [espectro(audio) for audio in AUDIOS] + [espectro_aleatorio(seed) for seed in range(2)]
+
+
+#Con pocos candidatos muchos frames se repiten con todos los bins de la banda
+@pytest.mark.parametrize('banda, candidates', [((50, 1100), 64), ((50, 1100), 4), ((0, np.inf), 64)])
+def test_note_detector_igual_que_find_top_notes(espectros, banda, candidates):
+    for magnitudes, xf in espectros:
+        detector = NoteDetector(xf, *banda, candidates=candidates)
+        en_banda = (xf >= banda[0]) & (xf <= banda[1])
+        esperado = [find_top_notes_original(np.where(en_banda, fft, 0), xf, 5) for fft in magnitudes]
+        assert detector.detect(magnitudes, 5) == esperado
+
+
+def test_note_stats_igual_que_diccionario(espectros):
+    for magnitudes, xf in espectros:
+        found_frames = NoteDetector(xf).detect(magnitudes, 5)
+        esperado = estadisticas_original(found_frames)
+
+        por_frame = NoteStats()
+        for found in found_frames:
+            por_frame.update(found)
+        mitad = len(found_frames) // 2
+        por_bloques = NoteStats()
+        por_bloques.update_many(found_frames[:mitad])
+        segundo = NoteStats()
+        segundo.update_many(found_frames[mitad:])
+        por_bloques.merge(segundo)
+
+        for stats in (por_frame, por_bloques):
+            snapshot = stats.snapshot()
+            assert list(snapshot) == list(esperado)
+            assert {nota: {k: v for k, v in info.items() if k != 'mean_frequency'}
+                    for nota, info in snapshot.items()} == esperado
+
+
+def test_rango_vocal_igual_que_bucles():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        frecuencias = rng.uniform(30, 1200, rng.integers(1, 40))
+        frecuencias[::3] = frecuencias[0] + rng.uniform(-12, 12, len(frecuencias[::3]))  #Notas cercanas
+        data = {f'n{i}': {'frequency': float(f)} for i, f in enumerate(frecuencias)}
+
+        rango_vocal = RangoVocal(data)
+        resultado = rango_vocal.clasificar()
+        rango, conteo, filtradas = clasificar_original(rango_vocal.rangos, data)
+        assert resultado['rango'] == rango
+        assert resultado['conteo'] == conteo
+        assert resultado['filtradas'].tolist() == filtradas
+
+        min_f, max_f = rango_vocal.rangos[rango]
+        en_rango = sorted(({'note': nota, 'frequency': info['frequency']} for nota, info in data.items()
+                           if min_f <= info['frequency'] <= max_f), key=lambda x: x['frequency'])
+        assert rango_vocal.notas_en_rango(rango) == en_rango
+
+
+def test_tonalidad_igual_que_escalas():
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        clases = rng.choice(NOTAS, rng.integers(1, 13), replace=False)
+        notas_grabadas = {nota: int(rng.integers(1, 5)) for nota in clases}
+
+        prediccion = PrediccionTonalidad(notas_grabadas)
+        esperado = tonalidad_original(notas_grabadas, prediccion.escalas)
+        assert prediccion.predecir_tonalidad(guardar=False) == esperado
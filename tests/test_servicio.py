@@ -0,0 +1,76 @@
+"""Comportamiento del servicio que no necesita los pools de procesos."""
+import os
+
+import pytest
+
+from service import ErrorHTTP, ServicioAnalisis, Trabajo
+
+
+def trabajos_terminados(servicio, tmp_path, tiempos):
+    #Trabajos ya terminados en los instantes indicados, cada uno con su carpeta
+    for i, terminado_en in enumerate(tiempos):
+        folder = tmp_path / f'job{i}'
+        folder.mkdir()
+        trabajo = Trabajo(f'job{i}', 'audio.wav', str(folder), {}, False)
+        trabajo.estado = 'done'
+        trabajo.terminado_en = terminado_en
+        servicio.trabajos[trabajo.id] = trabajo
+
+
+def test_podar_por_retencion(tmp_path):
+    servicio = ServicioAnalisis(str(tmp_path), retencion=100, max_terminados=None)
+    trabajos_terminados(servicio, tmp_path, [0, 50, 150])
+    en_curso = Trabajo('activo', 'audio.wav', str(tmp_path), {}, False)
+    servicio.trabajos['activo'] = en_curso
+
+    servicio.podar(ahora=200)
+    assert sorted(servicio.trabajos) == ['activo', 'job2']
+    assert not os.path.exists(tmp_path / 'job0') and not os.path.exists(tmp_path / 'job1')
+    assert os.path.exists(tmp_path / 'job2')
+
+
+def test_podar_por_numero(tmp_path):
+    servicio = ServicioAnalisis(str(tmp_path), retencion=None, max_terminados=2)
+    trabajos_terminados(servicio, tmp_path, [30, 10, 20, 40])
+
+    servicio.podar()
+    assert sorted(servicio.trabajos) == ['job0', 'job3']  #Los dos terminados más recientemente
+    assert sorted(os.listdir(tmp_path)) == ['job0', 'job3']
+
+
+@pytest.mark.parametrize('cambios', [
+    [1], 'fps=24', {'fps': 'x'}, {'fps': True}, {'fps': 24.5}, {'floor': '0.1'}, {'resolution': [640]},
+    {'resolution': [640, 'x']}, {'pitch': None}, {'chord_overlay': 1}, {'key_window_seconds': 'no'},
+])
+def test_config_no_valida(tmp_path, cambios):
+    servicio = ServicioAnalisis(str(tmp_path))
+    with pytest.raises(ErrorHTTP) as error:
+        servicio._config_trabajo(str(tmp_path), cambios)
+    assert error.value.estado == 400
+
+
+def test_config_valida(tmp_path):
+    servicio = ServicioAnalisis(str(tmp_path))
+    config = servicio._config_trabajo(str(tmp_path), {
+        'fps': 24, 'floor': 0, 'fft_window_seconds': 1, 'freq_max': 880.5, 'resolution': [640, 360],
+        'skip_tolerance': None, 'key_window_seconds': 4, 'chord_overlay': True, 'pitch': 'bin'})
+    assert config['resolution'] == (640, 360) and config['skip_tolerance'] is None and config['fps'] == 24
+
+
+def test_rutas_dentro_de_raiz(tmp_path, monkeypatch):
+    raiz = tmp_path / 'raiz'
+    raiz.mkdir()
+    (raiz / 'audio.wav').write_bytes(b'')
+    (tmp_path / 'fuera.wav').write_bytes(b'')
+    (raiz / 'enlace.wav').symlink_to(tmp_path / 'fuera.wav')
+    monkeypatch.chdir(raiz)
+
+    servicio = ServicioAnalisis(str(tmp_path / 'service'))  #Por defecto, la carpeta actual
+    assert servicio._ruta_permitida('audio.wav') == str(raiz / 'audio.wav')
+    for path in ('../fuera.wav', str(tmp_path / 'fuera.wav'), 'enlace.wav', '/etc/hostname', 'falta.wav', 3):
+        with pytest.raises(ErrorHTTP) as error:
+            servicio._ruta_permitida(path)
+        assert error.value.estado == 400
+
+    cualquiera = ServicioAnalisis(str(tmp_path / 'service'), raiz=None)
+    assert cualquiera._ruta_permitida('../fuera.wav') == str(tmp_path / 'fuera.wav')
@@ -1,4 +1,9 @@
 import json
+import os
+
+import numpy as np
+
+from Notes import NoteStats
 
 #Intervalos para las escalas mayores y menores
 INTERVALOS_MAYOR = [2, 2, 1, 2, 2, 2, 1]
@@ -6,11 +11,104 @@ INTERVALOS_MENOR = [2, 1, 2, 2, 1, 2, 2]
 
 NOTAS = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
 
+#Perfiles de tonalidad de Krumhansl-Kessler (tónica en la posición 0)
+PERFIL_MAYOR = [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]
+PERFIL_MENOR = [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]
+
+def _tonalidades():
+    #Nombres de las 24 tonalidades, máscaras de sus escalas y perfiles (tonalidades x 12)
+    nombres, mascaras, perfiles = [], [], []
+    for indice, nota in enumerate(NOTAS):
+        for modo, intervalos, perfil in (("Major", INTERVALOS_MAYOR, PERFIL_MAYOR),
+                                         ("Minor", INTERVALOS_MENOR, PERFIL_MENOR)):
+            mascara = np.zeros(12)
+            mascara[(indice + np.cumsum([0] + intervalos[:-1])) % 12] = 1
+            nombres.append(f"{nota} {modo}")
+            mascaras.append(mascara)
+            perfiles.append(np.roll(perfil, indice))
+    return nombres, np.array(mascaras), np.array(perfiles)
+
+
+TONALIDADES, MASCARAS, PERFILES = _tonalidades()
+
+
+def puntuar_tonalidades(histograma, metodo='escalas'):
+    """Puntuación de las 24 tonalidades para uno o varios histogramas de 12 clases de altura.
+
+    'escalas' suma los conteos de las notas de cada escala; 'krumhansl' es la correlación
+    con el perfil de cada tonalidad. Con una matriz (ventanas x 12) devuelve ventanas x 24.
+    """
+    histograma = np.asarray(histograma, dtype=float)
+    if metodo == 'escalas':
+        return histograma @ MASCARAS.T
+    if metodo == 'krumhansl':
+        perfiles = PERFILES - PERFILES.mean(axis=1, keepdims=True)
+        perfiles /= np.linalg.norm(perfiles, axis=1, keepdims=True)
+        centrado = histograma - histograma.mean(axis=-1, keepdims=True)
+        norma = np.linalg.norm(centrado, axis=-1, keepdims=True)
+        return (centrado / np.where(norma > 0, norma, 1)) @ perfiles.T
+    raise ValueError(f"Método no soportado: {metodo}")
+
+
+def clases_de_frames(notas_frames):
+    """Clase de altura (0-11) de la nota principal de cada frame (-1 si no hay nota)."""
+    clases = np.full(len(notas_frames), -1, dtype=int)
+    filas = [i for i, found in enumerate(notas_frames) if found]
+    if filas:
+        freqs = np.array([notas_frames[i][0][0] for i in filas], dtype=float)
+        clases[filas] = np.rint(69 + 12 * np.log2(freqs / 440.0)).astype(int) % 12
+    return clases
+
+
+def seguir_tonalidad(notas_frames, fps, ventana_segundos=4.0, salto_segundos=1.0, metodo='krumhansl'):
+    """Tonalidad más probable en ventanas deslizantes a lo largo de la grabación.
+
+    Los histogramas de todas las ventanas salen de sumas acumuladas y se puntúan con un
+    único producto de matrices. Devuelve segmentos {key, start, end} (en segundos) que unen
+    las ventanas consecutivas con la misma tonalidad; key es None en las ventanas sin notas
+    y en las que varias tonalidades empatan con la mejor puntuación.
+    """
+    clases = clases_de_frames(notas_frames)
+    if not len(clases):
+        return []
+    ventana = max(1, int(round(ventana_segundos * fps)))
+    salto = max(1, int(round(salto_segundos * fps)))
+
+    #Conteo acumulado de cada clase: el histograma de [a, b) es acumulado[b] - acumulado[a]
+    unos = np.zeros((len(clases) + 1, 12))
+    validas = np.flatnonzero(clases >= 0)
+    unos[validas + 1, clases[validas]] = 1
+    acumulado = np.cumsum(unos, axis=0)
+
+    inicios = np.arange(0, max(len(clases) - ventana, 0) + 1, salto)
+    finales = np.minimum(inicios + ventana, len(clases))
+    histogramas = acumulado[finales] - acumulado[inicios]
+    puntajes = puntuar_tonalidades(histogramas, metodo)
+    mejores = puntajes.argmax(axis=1)
+    empatadas = (puntajes == puntajes.max(axis=1, keepdims=True)).sum(axis=1) > 1
+    sin_tonalidad = (histogramas.sum(axis=1) == 0) | empatadas
+
+    segmentos = []
+    for inicio, final, mejor, ninguna in zip(inicios, finales, mejores, sin_tonalidad):
+        tonalidad = None if ninguna else TONALIDADES[mejor]
+        if segmentos and segmentos[-1]['key'] == tonalidad:
+            segmentos[-1]['end'] = float(final / fps)
+        else:
+            segmentos.append({'key': tonalidad, 'start': float(inicio / fps), 'end': float(final / fps)})
+    return segmentos
+
+
 class PrediccionTonalidad:
-    def __init__(self, notas_grabadas):
-        #Carga el archivo JSON de las notas grabadas
-        self.notas_grabadas = self.cargar_json(notas_grabadas)
+    def __init__(self, notas_grabadas, record_data_folder='record_data'):
+        #Acepta la ruta del JSON de notas grabadas, el diccionario ya en memoria, un NoteStats
+        #o directamente un histograma de 12 clases de altura
+        if isinstance(notas_grabadas, (dict, NoteStats, np.ndarray, list)):
+            self.notas_grabadas = notas_grabadas
+        else:
+            self.notas_grabadas = self.cargar_json(notas_grabadas)
+        self.record_data_folder = record_data_folder
         self.escalas = self.generar_escalas()
+        self.histograma = self.histograma_clases(self.notas_grabadas)
 
     def cargar_json(self, archivo):
         """Función para cargar archivos JSON."""
@@ -34,32 +132,43 @@ class PrediccionTonalidad:
             escalas[f"{nota} Minor"] = self.generar_escala(nota, INTERVALOS_MENOR)
         return escalas
 
-    def calcular_coincidencias(self, notas, escala):
-        """Calcula cuántas notas de las más comunes coinciden con la escala."""
-        coincidencias = 0
-        for nota in notas:
-            if nota in escala:
-                coincidencias += self.notas_grabadas[nota]
-        return coincidencias
+    @classmethod
+    def histograma_clases(cls, notas):
+        """Histograma de 12 clases de altura a partir de notes.json, un NoteStats o un histograma."""
+        if isinstance(notas, dict):
+            histograma = np.zeros(12)
+            for nota, info in notas.items():
+                histograma[NOTAS.index(cls.clase_de_nota(nota))] += cls.peso(info)
+            return histograma
+        if isinstance(notas, NoteStats):
+            #Conteos indexados por número MIDI
+            return np.bincount(np.arange(len(notas.count)) % 12, weights=notas.count, minlength=12)
+        histograma = np.asarray(notas, dtype=float)
+        if histograma.shape != (12,):
+            raise ValueError("El histograma debe tener 12 clases de altura.")
+        return histograma
 
-    def predecir_tonalidad(self):
-        """Predice la tonalidad más probable."""
-        mejor_puntaje = -1
-        escalas_detectadas = []
+    @staticmethod
+    def clase_de_nota(nota):
+        """Quita la octava del nombre de la nota ('A#3' -> 'A#')."""
+        return nota.rstrip('-0123456789')
 
-        notas_grabadas_keys = self.notas_grabadas.keys()
+    @staticmethod
+    def peso(info):
+        """Número de veces que se contó la nota (notes.json guarda un diccionario por nota)."""
+        return info['count'] if isinstance(info, dict) else info
 
-        for tonalidad, escala in self.escalas.items():
-            #Calcular el puntaje para cada tonalidad
-            puntaje = self.calcular_coincidencias(notas_grabadas_keys, escala)
+    def puntuaciones(self, metodo='escalas'):
+        """Puntuación de cada tonalidad."""
+        return dict(zip(TONALIDADES, puntuar_tonalidades(self.histograma, metodo).tolist()))
 
-            if puntaje > mejor_puntaje:
-                mejor_puntaje = puntaje
-                escalas_detectadas = [tonalidad]  #Limpiar y agregar la mejor tonalidad
-            elif puntaje == mejor_puntaje:
-                escalas_detectadas.append(tonalidad)  #Agregar si hay empate
+    def predecir_tonalidad(self, metodo='escalas', guardar=True):
+        """Predice la tonalidad más probable (todas las empatadas con la mejor puntuación)."""
+        puntajes = puntuar_tonalidades(self.histograma, metodo)
+        escalas_detectadas = [TONALIDADES[i] for i in np.flatnonzero(puntajes == puntajes.max())]
 
-        self.guardar_tonalidades(escalas_detectadas)
+        if guardar:
+            self.guardar_tonalidades(escalas_detectadas)
 
         return escalas_detectadas
 
@@ -67,5 +176,5 @@ class PrediccionTonalidad:
         """Guarda las escalas y sus notas en un archivo JSON."""
         tonalidades = {tonalidad: self.escalas[tonalidad] for tonalidad in escalas_detectadas}
 
-        with open('record_data/tonalities.json', 'w') as json_file:
-            json.dump(tonalidades, json_file, indent=4)
\ No newline at end of file
+        with open(os.path.join(self.record_data_folder, 'tonalities.json'), 'w') as json_file:
+            json.dump(tonalidades, json_file, indent=4)